@@ -0,0 +1 @@
+"""Synthetic-data benchmarks: ``python -m benchmarks run``."""
@@ -0,0 +1,63 @@
+import argparse
+import json
+from pathlib import Path
+
+from benchmarks.generate import write_fixtures
+from benchmarks.runner import compare, run, write_results
+from benchmarks.scenarios import SCENARIOS, prepare_workspace
+
+WORK_DIR = '.bench'
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='Run timed scenarios')
+    run_parser.add_argument('--events', type=int, default=10_000,
+                            help='Synthetic ACLED events, 10k to 50M')
+    run_parser.add_argument('--start', default='2018-01')
+    run_parser.add_argument('--end', default='2024-12')
+    run_parser.add_argument('--seed', type=int, default=0)
+    run_parser.add_argument('--repeat', type=int, default=5)
+    run_parser.add_argument('--scenario', nargs='*', choices=list(SCENARIOS),
+                            help='Defaults to every scenario')
+    run_parser.add_argument('--workdir', default=None,
+                            help=f'Defaults to {WORK_DIR}/<events>-<seed>')
+    run_parser.add_argument('--out', default='bench-results.json')
+
+    compare_parser = commands.add_parser(
+        'compare', help='Report metrics that regressed between two runs'
+    )
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('candidate')
+    compare_parser.add_argument('--threshold', type=float, default=0.1)
+
+    commands.add_parser('fixtures', help='Regenerate the GeoJSON fixtures')
+    args = parser.parse_args(argv)
+
+    if args.command == 'fixtures':
+        write_fixtures()
+    elif args.command == 'run':
+        config = {'events': args.events, 'start': args.start,
+                  'end': args.end, 'seed': args.seed}
+        workdir = Path(args.workdir or f'{WORK_DIR}/{args.events}-{args.seed}')
+        workdir = prepare_workspace(workdir.resolve(), config)
+        results = run(args.scenario or list(SCENARIOS), workdir,
+                      args.repeat, config)
+        print(f'{len(results["results"])} metrics -> '
+              f'{write_results(results, args.out)}')
+    else:
+        regressions = compare(json.loads(Path(args.baseline).read_text()),
+                              json.loads(Path(args.candidate).read_text()),
+                              args.threshold)
+        for row in regressions:
+            print(f'{row["scenario"]}/{row["metric"]}: {row["baseline"]:.4g}'
+                  f' -> {row["candidate"]:.4g} {row["unit"]}'
+                  f' ({row["ratio"]:.2f}x)')
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+"""Seeded synthetic ACLED events, OECD SDMX rows and boundary fixtures."""
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+import shapely
+
+FIXTURE_DIR = Path(__file__).parent / 'fixtures'
+
+EVENT_TYPES = {
+    'Protests': ['Peaceful protest', 'Protest with intervention'],
+    'Riots': ['Mob violence', 'Violent demonstration'],
+    'Battles': ['Armed clash'],
+    'Violence against civilians': ['Attack'],
+}
+MEASURES = [
+    ('CP', 'Consumer prices'),
+    ('PRVM', 'Production volume'),
+    ('UNEMP', 'Unemployment rate'),
+    ('SHARE', 'Share prices'),
+    ('XTEXVA01', 'Merchandise exports'),
+    ('XTIMVA01', 'Merchandise imports'),
+]
+TRANSFORMATIONS = [('GY', 'Growth rate, over 1 year'), ('_Z', 'Not applicable')]
+OECD_COLUMNS = [
+    'STRUCTURE', 'STRUCTURE_ID', 'STRUCTURE_NAME', 'ACTION', 'REF_AREA',
+    'Reference area', 'FREQ', 'Frequency of observation', 'MEASURE',
+    'Measure', 'UNIT_MEASURE', 'Unit of measure', 'TRANSFORMATION',
+    'Transformation', 'TIME_PERIOD', 'Time period', 'OBS_VALUE',
+    'Observation value', 'OBS_STATUS', 'Observation status',
+]
+
+
+@dataclass(frozen=True)
+class Country:
+    iso: str
+    alpha_3: str
+    name: str
+    grid: tuple[int, int]
+    bbox: tuple[float, float, float, float]
+    weight: float
+
+
+# Small, medium and large by region count and share of events.
+COUNTRIES = [
+    Country('246', 'FIN', 'Finland', (2, 2), (20.0, 60.0, 30.0, 70.0), 0.1),
+    Country('276', 'DEU', 'Germany', (4, 4), (6.0, 47.0, 15.0, 55.0), 0.3),
+    Country('566', 'NGA', 'Nigeria', (6, 6), (3.0, 4.0, 14.0, 14.0), 0.6),
+]
+
+
+def grid_geojson(nx: int,
+                 ny: int,
+                 bbox: tuple[float, float, float, float],
+                 segments: int = 100,
+                 amplitude: float = 0.05,
+                 seed: int = 0) -> dict:
+    """ADM1-style grid whose shared borders are identical wiggly lines."""
+    rng = np.random.default_rng(seed)
+    minx, miny, maxx, maxy = bbox
+    xs, ys = np.linspace(minx, maxx, nx + 1), np.linspace(miny, maxy, ny + 1)
+    t = np.linspace(0, 1, segments + 1)
+
+    def wiggle(n: int, interior: bool) -> np.ndarray:
+        if not interior:
+            return np.zeros(n)
+        phase, freq = rng.uniform(0, 2 * np.pi), rng.integers(3, 9)
+        return amplitude * np.sin(np.pi * t) * np.sin(freq * np.pi * t + phase)
+
+    # Horizontal edges h[j][i] run along y=ys[j] from xs[i] to xs[i+1];
+    # vertical edges v[i][j] along x=xs[i] from ys[j] to ys[j+1].
+    h = [[np.column_stack([xs[i] + t * (xs[i + 1] - xs[i]),
+                           ys[j] + wiggle(len(t), 0 < j < ny)])
+          for i in range(nx)] for j in range(ny + 1)]
+    v = [[np.column_stack([xs[i] + wiggle(len(t), 0 < i < nx),
+                           ys[j] + t * (ys[j + 1] - ys[j])])
+          for j in range(ny)] for i in range(nx + 1)]
+
+    features = []
+    for j in range(ny):
+        for i in range(nx):
+            ring = np.vstack([h[j][i][:-1], v[i + 1][j][:-1],
+                              h[j + 1][i][::-1][:-1], v[i][j][::-1]])
+            features.append({
+                'type': 'Feature',
+                'properties': {'shapeName': f'Region {j * nx + i + 1}',
+                               'shapeType': 'ADM1'},
+                'geometry': {'type': 'Polygon',
+                             'coordinates': [np.round(ring, 6).tolist()]},
+            })
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def write_fixtures(fixture_dir: str | Path = FIXTURE_DIR) -> None:
+    fixture_dir = Path(fixture_dir)
+    fixture_dir.mkdir(parents=True, exist_ok=True)
+    for seed, country in enumerate(COUNTRIES):
+        geojson = grid_geojson(*country.grid, country.bbox, seed=seed)
+        (fixture_dir / f'{country.iso}.geojson').write_text(
+            json.dumps(geojson, separators=(',', ':'))
+        )
+
+
+def load_fixture(iso: str, fixture_dir: str | Path = FIXTURE_DIR) -> dict:
+    return json.loads((Path(fixture_dir) / f'{iso}.geojson').read_text())
+
+
+def months(start: str, end: str) -> list[str]:
+    return [str(m) for m in np.arange(np.datetime64(start, 'M'),
+                                      np.datetime64(end, 'M') + 1)]
+
+
+def sample_points(geojson: dict,
+                  n: int,
+                  rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+    """Uniform points inside the polygons, weighting regions by area."""
+    geoms = np.array([shapely.geometry.shape(f['geometry'])
+                      for f in geojson['features']])
+    area = shapely.area(geoms)
+    region = rng.choice(len(geoms), n, p=area / area.sum())
+    lon, lat = np.empty(n), np.empty(n)
+    for r in np.unique(region):
+        rows = np.flatnonzero(region == r)
+        minx, miny, maxx, maxy = shapely.bounds(geoms[r])
+        filled = 0
+        while filled < len(rows):
+            need = len(rows) - filled
+            x = rng.uniform(minx, maxx, need * 2)
+            y = rng.uniform(miny, maxy, need * 2)
+            inside = shapely.contains_xy(geoms[r], x, y)
+            x, y = x[inside][:need], y[inside][:need]
+            lon[rows[filled:filled + len(x)]] = x
+            lat[rows[filled:filled + len(y)]] = y
+            filled += len(x)
+    return lon, lat
+
+
+def acled_chunk(n: int,
+                start: str,
+                end: str,
+                rng: np.random.Generator,
+                first_id: int = 0,
+                countries: list[Country] = COUNTRIES) -> pl.DataFrame:
+    weights = np.array([c.weight for c in countries])
+    country_idx = rng.choice(len(countries), n, p=weights / weights.sum())
+    day_count = int((np.datetime64(end, 'M') + 1 - np.datetime64(start, 'M'))
+                    .astype('timedelta64[D]').astype(int))
+    dates = (np.datetime64(f'{start}-01')
+             + rng.integers(0, day_count, n).astype('timedelta64[D]'))
+    lon, lat = np.empty(n), np.empty(n)
+    for i, country in enumerate(countries):
+        rows = np.flatnonzero(country_idx == i)
+        lon[rows], lat[rows] = sample_points(load_fixture(country.iso),
+                                             len(rows), rng)
+    event_types = list(EVENT_TYPES)
+    type_idx = rng.choice(len(event_types), n, p=[0.55, 0.2, 0.15, 0.1])
+    sub_types = [EVENT_TYPES[event_types[t]][0] for t in range(len(event_types))]
+    return pl.DataFrame({
+        'event_id_cnty': [f'SYN{first_id + i}' for i in range(n)],
+        'event_date': dates.astype(str),
+        'year': dates.astype('datetime64[Y]').astype(int) + 1970,
+        'event_type': np.array(event_types)[type_idx],
+        'sub_event_type': np.array(sub_types)[type_idx],
+        'country': np.array([c.name for c in countries])[country_idx],
+        'iso': np.array([c.iso for c in countries])[country_idx],
+        'admin1': [f'Admin {k}' for k in rng.integers(1, 20, n)],
+        'location': [f'Town {k}' for k in rng.integers(1, 500, n)],
+        'latitude': lat.round(4),
+        'longitude': lon.round(4),
+        'fatalities': rng.poisson(0.4, n),
+        'notes': [f'Synthetic event {first_id + i}.' for i in range(n)],
+    })
+
+
+def write_acled(path: str | Path,
+                n_events: int,
+                start: str = '2018-01',
+                end: str = '2024-12',
+                seed: int = 0,
+                chunk_rows: int = 1_000_000) -> Path:
+    """Write ``n_events`` in chunks so 50M-event files fit in memory."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    with path.open('wb') as f:
+        for first in range(0, n_events, chunk_rows):
+            chunk = acled_chunk(min(chunk_rows, n_events - first),
+                                start, end, rng, first_id=first)
+            chunk.write_csv(f, include_header=first == 0)
+    return path
+
+
+def write_oecd(path: str | Path,
+               start: str = '2018-01',
+               end: str = '2024-12',
+               seed: int = 0,
+               countries: list[Country] = COUNTRIES) -> Path:
+    rng = np.random.default_rng(seed)
+    periods = months(start, end)
+    rows = []
+    for country in countries:
+        for code, measure in MEASURES:
+            level = rng.uniform(50, 150)
+            walk = level + np.cumsum(rng.normal(0, 1, len(periods)))
+            for transformation, label in TRANSFORMATIONS:
+                for period, value in zip(periods, walk):
+                    rows.append((country.alpha_3, country.name, code, measure,
+                                 transformation, label, period, float(value)))
+    df = pl.DataFrame(rows, orient='row', schema=[
+        'REF_AREA', 'Reference area', 'MEASURE', 'Measure',
+        'TRANSFORMATION', 'Transformation', 'TIME_PERIOD', 'OBS_VALUE',
+    ]).with_columns(
+        STRUCTURE=pl.lit('DATAFLOW'),
+        STRUCTURE_ID=pl.lit('OECD.SDD.STES:DSD_KEI@DF_KEI(4.0)'),
+        STRUCTURE_NAME=pl.lit('Key short-term economic indicators'),
+        ACTION=pl.lit('I'),
+        FREQ=pl.lit('M'),
+        **{'Frequency of observation': pl.lit('Monthly')},
+        UNIT_MEASURE=pl.lit('GR'),
+        **{'Unit of measure': pl.lit('Growth rate')},
+        **{'Time period': pl.lit(None, pl.String)},
+        **{'Observation value': pl.lit(None, pl.String)},
+        OBS_STATUS=pl.lit('A'),
+        **{'Observation status': pl.lit('Normal value')},
+    ).select(OECD_COLUMNS)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df.write_csv(path)
+    return path
@@ -0,0 +1,149 @@
+"""Runs scenarios in fresh processes and writes a JSON results file."""
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from benchmarks.scenarios import SCENARIOS, Timings
+
+RESULTS_SCHEMA = 1
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def peak_rss() -> int:
+    """Peak resident memory in bytes, including polars and NumPy buffers.
+
+    VmHWM is preferred because ru_maxrss survives exec, so a spawned
+    child would report its parent's peak.
+    """
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def _run_in_child(name: str,
+                  workdir: str,
+                  repeat: int,
+                  config: dict) -> tuple[Timings, int]:
+    os.chdir(workdir)
+    timings = SCENARIOS[name](repeat, config)
+    return dict(timings), peak_rss()
+
+
+def run_scenario(name: str,
+                 workdir: str | Path,
+                 repeat: int,
+                 config: dict) -> tuple[Timings, int]:
+    """A fresh spawn process per scenario gives cold starts and its own peak."""
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(_run_in_child, name, str(workdir),
+                           repeat, config).result()
+
+
+def summarize(scenario: str, metric: str, samples: list[float]) -> dict:
+    return {
+        'scenario': scenario,
+        'metric': metric,
+        'unit': 's',
+        'samples': samples,
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'mean': statistics.fmean(samples),
+    }
+
+
+def git_revision() -> dict[str, Any]:
+    def git(*args: str) -> str:
+        return subprocess.run(['git', *args], cwd=REPO_ROOT, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    try:
+        return {'commit': git('rev-parse', 'HEAD'),
+                'dirty': bool(git('status', '--porcelain', '--', 'src'))}
+    except (OSError, subprocess.CalledProcessError):
+        return {'commit': None, 'dirty': None}
+
+
+def environment() -> dict[str, Any]:
+    import numpy
+    import polars
+    import sklearn
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'polars': polars.__version__,
+        'numpy': numpy.__version__,
+        'sklearn': sklearn.__version__,
+    }
+
+
+def run(scenarios: list[str],
+        workdir: str | Path,
+        repeat: int,
+        config: dict) -> dict[str, Any]:
+    results = []
+    for name in scenarios:
+        timings, peak = run_scenario(name, workdir, repeat, config)
+        results.extend(summarize(name, metric, samples)
+                       for metric, samples in timings.items())
+        results.append({'scenario': name, 'metric': 'peak_rss',
+                        'unit': 'bytes', 'value': peak})
+    return {
+        'schema': RESULTS_SCHEMA,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'environment': environment(),
+        'config': {**config, 'repeat': repeat},
+        'results': results,
+    }
+
+
+def _key(row: dict) -> tuple[str, str]:
+    return row['scenario'], row['metric']
+
+
+def _value(row: dict) -> float:
+    return row['median'] if 'median' in row else row['value']
+
+
+def compare(baseline: dict,
+            candidate: dict,
+            threshold: float = 0.1) -> list[dict[str, Any]]:
+    """Rows whose median (or peak) grew by more than ``threshold``."""
+    before = {_key(row): row for row in baseline['results']}
+    regressions = []
+    for row in candidate['results']:
+        old = before.get(_key(row))
+        if old is None or _value(old) <= 0:
+            continue
+        ratio = _value(row) / _value(old)
+        if ratio > 1 + threshold:
+            regressions.append({'scenario': row['scenario'],
+                                'metric': row['metric'],
+                                'unit': row['unit'],
+                                'baseline': _value(old),
+                                'candidate': _value(row),
+                                'ratio': ratio})
+    return regressions
+
+
+def write_results(results: dict, path: str | Path) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=1))
+    return path
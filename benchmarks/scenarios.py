@@ -0,0 +1,208 @@
+"""Timed scenarios; each runs inside a prepared workspace directory."""
+import json
+import time
+from collections import defaultdict
+from collections.abc import Callable
+from contextlib import chdir
+from pathlib import Path
+
+from benchmarks.generate import (
+    COUNTRIES,
+    FIXTURE_DIR,
+    months,
+    write_acled,
+    write_oecd,
+)
+
+OECD_CSV = 'data/final/oecd.csv'
+ACLED_CSV = 'data/final/acled.csv'
+DATA_CSV = 'data/final/data.csv'
+RANGE_WIDTHS = (1, 12, 60)
+
+Timings = dict[str, list[float]]
+Scenario = Callable[[int, dict], Timings]
+
+
+def prepare_workspace(root: str | Path, config: dict) -> Path:
+    """Generate inputs, boundaries and a registered model once per config."""
+    from civil_unrest_correlation_analysis.utils.boundaries import (
+        BoundaryStore,
+    )
+    from civil_unrest_correlation_analysis.utils.building import build_dataset
+    from civil_unrest_correlation_analysis.utils.cleaning import (
+        clean_acled,
+        clean_oecd,
+    )
+    from civil_unrest_correlation_analysis.utils.model import (
+        ModelRegistry,
+        data_hash,
+    )
+    from civil_unrest_correlation_analysis.utils.training import train
+
+    root = Path(root)
+    config_path = root / 'config.json'
+    if config_path.exists() and json.loads(config_path.read_text()) == config:
+        return root
+    root.mkdir(parents=True, exist_ok=True)
+    write_acled(root / ACLED_CSV, config['events'], config['start'],
+                config['end'], seed=config['seed'])
+    write_oecd(root / OECD_CSV, config['start'], config['end'],
+               seed=config['seed'])
+    boundaries = BoundaryStore(root / 'data/boundaries')
+    for country in COUNTRIES:
+        boundaries.put(country.iso, 'ADM1',
+                       (FIXTURE_DIR / f'{country.iso}.geojson').read_bytes())
+
+    with chdir(root):
+        data = build_dataset(OECD_CSV, ACLED_CSV, DATA_CSV,
+                             read_data_csv=False,
+                             incidents=clean_acled(ACLED_CSV),
+                             oecd=clean_oecd(OECD_CSV))
+        pipe, metadata = train(data, n_iter=1, n_splits=2, seed=config['seed'])
+        ModelRegistry().put(data_hash(data), pipe, metadata)
+    config_path.write_text(json.dumps(config))
+    return root
+
+
+def _timed(timings: Timings, key: str, fn: Callable, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    timings[key].append(time.perf_counter() - started)
+    return result
+
+
+def clean_oecd_scenario(repeat: int, config: dict) -> Timings:
+    from civil_unrest_correlation_analysis.utils.cleaning import clean_oecd
+    timings: Timings = defaultdict(list)
+    for _ in range(repeat):
+        _timed(timings, 'clean_oecd', clean_oecd, OECD_CSV)
+    return timings
+
+
+def load_acled_scenario(repeat: int, config: dict) -> Timings:
+    from civil_unrest_correlation_analysis.utils.cleaning import load_acled
+    timings: Timings = defaultdict(list)
+    for _ in range(repeat):
+        _timed(timings, 'load_acled', load_acled, ACLED_CSV)
+    return timings
+
+
+def build_dataset_scenario(repeat: int, config: dict) -> Timings:
+    from civil_unrest_correlation_analysis.utils.building import build_dataset
+    timings: Timings = defaultdict(list)
+    # Untimed warm-up writes the .xz copies a first rebuild would create.
+    build_dataset(OECD_CSV, ACLED_CSV, DATA_CSV, read_data_csv=False)
+    for _ in range(repeat):
+        _timed(timings, 'rebuild', build_dataset,
+               OECD_CSV, ACLED_CSV, DATA_CSV, read_data_csv=False)
+        _timed(timings, 'read', build_dataset, OECD_CSV, ACLED_CSV, DATA_CSV)
+    return timings
+
+
+def startup_scenario(repeat: int, config: dict) -> Timings:
+    timings: Timings = defaultdict(list)
+    started = time.perf_counter()
+    from fastapi.testclient import TestClient
+
+    from civil_unrest_correlation_analysis import main
+    timings['import'].append(time.perf_counter() - started)
+    for _ in range(repeat):
+        client = TestClient(main.app)
+        started = time.perf_counter()
+        client.__enter__()
+        timings['lifespan'].append(time.perf_counter() - started)
+        _timed(timings, 'first_byte', client.get, '/healthz')
+        main.READINESS.wait()
+        timings['ready'].append(time.perf_counter() - started)
+        client.__exit__(None, None, None)
+    return timings
+
+
+def snapshot_scenario(repeat: int, config: dict) -> Timings:
+    """Per-stage latency by country size and range width, cold then warm."""
+    import pycountry
+    from fastapi.testclient import TestClient
+
+    from civil_unrest_correlation_analysis import main
+    from civil_unrest_correlation_analysis.schema import SnapshotResponse
+    from civil_unrest_correlation_analysis.utils.building import (
+        EVENT_COLUMNS,
+        build_acled_events_dict,
+        build_comparison,
+        build_country_map,
+        build_filtered_acled_events,
+        build_snapshot,
+        filter_data,
+    )
+    from civil_unrest_correlation_analysis.utils.cube import region_counts
+    from civil_unrest_correlation_analysis.viz.chart import (
+        counts_dataset,
+        line_dataset,
+        render_spec,
+    )
+
+    timings: Timings = defaultdict(list)
+    all_months = months(config['start'], config['end'])
+    with TestClient(main.app):
+        if not main.READINESS.wait():
+            raise RuntimeError(f'Warm-up failed: {main.READINESS.states()}')
+        acled, predictions = main.INDEXES['acled'], main.INDEXES['predictions']
+        for country in COUNTRIES:
+            iso = country.iso
+            cubes, lods = main.CUBES['acled'], main.LOD_CACHE
+            _timed(timings, f'{iso}/cold/geometry', main.GEOMETRY.get, iso)
+            _timed(timings, f'{iso}/cold/cube', cubes.get, iso)
+            _timed(timings, f'{iso}/cold/regions',
+                   lods.regions, iso, 0, 'geojson')
+            for width in RANGE_WIDTHS:
+                start, end = all_months[-width], all_months[-1]
+                prefix = f'{iso}/w{width}'
+                for _ in range(repeat):
+                    events = _timed(timings, f'{prefix}/slice',
+                                    build_filtered_acled_events,
+                                    acled, iso, start, end)
+                    events_dict = _timed(timings, f'{prefix}/events_dict',
+                                         build_acled_events_dict,
+                                         events.select(EVENT_COLUMNS))
+                    data = _timed(timings, f'{prefix}/predictions',
+                                  filter_data, predictions, iso, start, end)
+                    counts = _timed(timings, f'{prefix}/region_counts',
+                                    region_counts, cubes.get(iso), start, end)
+                    spec = _timed(timings, f'{prefix}/render_spec',
+                                  render_spec, 'geojson',
+                                  line_dataset(data),
+                                  lods.regions(iso, 0, 'geojson'),
+                                  counts_dataset(counts))
+                    response = SnapshotResponse(
+                        iso=iso,
+                        country=pycountry.countries.get(numeric=iso).name,
+                        start=start, end=end, acled_events=events_dict,
+                        map_spec=spec,
+                    )
+                    _timed(timings, f'{prefix}/serialize',
+                           response.model_dump_json)
+                    _timed(timings, f'{prefix}/total', build_snapshot,
+                           lods, cubes, acled, predictions, iso, start, end)
+        countries = [main.COUNTRIES[country.iso] for country in COUNTRIES]
+
+        def compare(start: str, end: str):
+            maps = [build_country_map(lods, cubes, country.iso, start, end)
+                    for country in countries]
+            return build_comparison(predictions, countries, maps, start, end
+                                    ).model_dump_json()
+
+        for width in RANGE_WIDTHS:
+            start, end = all_months[-width], all_months[-1]
+            for _ in range(repeat):
+                _timed(timings, f'compare/w{width}/total', compare, start, end)
+    return timings
+
+
+SCENARIOS: dict[str, Scenario] = {
+    'clean_oecd': clean_oecd_scenario,
+    'load_acled': load_acled_scenario,
+    'build_dataset': build_dataset_scenario,
+    'startup': startup_scenario,
+    'snapshot': snapshot_scenario,
+}
+
@@ -1,35 +1,134 @@
+import asyncio
+import importlib
+import logging
+import os
+import threading
+import time
 from contextlib import asynccontextmanager
-from typing import Any
+from typing import Any, Literal
 
 import polars as pl
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sklearn.model_selection import train_test_split
-from sklearn.pipeline import Pipeline
+from fastapi.responses import (
+    JSONResponse,
+    PlainTextResponse,
+    StreamingResponse,
+)
 
 from civil_unrest_correlation_analysis.schema import (
+    ComparisonResponse,
+    Correlation,
+    CorrelationResponse,
     CountryMeta,
+    ReadinessResponse,
     SnapshotResponse,
 )
 from civil_unrest_correlation_analysis.utils.building import (
-    build_countries_dict,
+    build_acled_index,
+    build_comparison,
+    build_country_map,
     build_dataset,
-    build_geojson_dict,
+    build_filtered_acled_events,
     build_snapshot,
-    clean_acled,
     clean_oecd,
-    raw_acled,
+    decode_cursor,
+    iter_events_ndjson,
+    load_acled,
+    load_countries,
+)
+from civil_unrest_correlation_analysis.utils.boundaries import BoundaryStore
+from civil_unrest_correlation_analysis.utils.cache import (
+    CachedBody,
+    ResponseCache,
+    etag_matches,
+    file_version,
+)
+from civil_unrest_correlation_analysis.utils.correlation import (
+    MAX_LAG,
+    load_correlation_table,
+)
+from civil_unrest_correlation_analysis.utils.cube import CubeCache
+from civil_unrest_correlation_analysis.utils.executor import (
+    Overloaded,
+    StageExecutor,
+)
+from civil_unrest_correlation_analysis.utils.forest import CompiledForest
+from civil_unrest_correlation_analysis.utils.geometry import GeometryCache
+from civil_unrest_correlation_analysis.utils.index import (
+    PartitionIndex,
+    build_partition_index,
+)
+from civil_unrest_correlation_analysis.utils.metrics import (
+    REQUEST_SECONDS,
+    collect_spans,
+    profile_if_slow,
+    record_frames,
+    record_span,
+    render_metrics,
+    server_timing,
+    span,
+    timed_load,
 )
-from civil_unrest_correlation_analysis.utils.model import import_pipeline
+from civil_unrest_correlation_analysis.utils.model import (
+    MODEL_DIR,
+    ModelRegistry,
+    data_hash,
+    load_prediction_table,
+)
+from civil_unrest_correlation_analysis.utils.preload import (
+    PRELOAD_DIR,
+    attach_or_build,
+)
+from civil_unrest_correlation_analysis.utils.store import store_path
+from civil_unrest_correlation_analysis.utils.topology import (
+    LODS,
+    LodCache,
+    build_regions_payload,
+)
+from civil_unrest_correlation_analysis.utils.warmup import Readiness
 
 OECD_CSV = 'data/final/oecd.csv'
 ACLED_CSV = 'data/final/acled.csv'
 DATA_CSV = 'data/final/data.csv'
-MODEL_PKL = 'random_forest.pkl'
+BOUNDARY_DIR = 'data/boundaries'
+SNAPSHOT_CACHE_BYTES = 256 * 1024 * 1024
+MAX_PAGE_SIZE = 10_000
+MAX_COMPARE_COUNTRIES = 20
+YEAR_MONTH = r'^\d{4}-(0[1-9]|1[0-2])$'
+SNAPSHOT_THREADS = int(os.environ.get('SNAPSHOT_THREADS', os.cpu_count() or 1))
+SNAPSHOT_PROCESSES = int(os.environ.get('SNAPSHOT_PROCESSES', '0'))
+SNAPSHOT_QUEUE_DEPTH = int(os.environ.get('SNAPSHOT_QUEUE_DEPTH', '64'))
+PRELOAD = os.environ.get('PRELOAD', '') == '1'
+SLOW_SNAPSHOT_SECONDS = (float(os.environ['SLOW_SNAPSHOT_MS']) / 1000
+                         if os.environ.get('SLOW_SNAPSHOT_MS') else None)
+PROFILE_DIR = 'data/profiles'
+PRELOAD_LAYOUT = 2
 DATAFRAMES: dict[str, pl.DataFrame] = {}
-MODELS: dict[str, Pipeline] = {}
+INDEXES: dict[str, PartitionIndex] = {}
+CUBES: dict[str, CubeCache] = {}
+MODELS: dict[str, CompiledForest] = {}
 COUNTRIES: dict[str, CountryMeta] = {}
-COUNTRIES_GEO: dict[str, Any] = {}
+REGISTRY = ModelRegistry(MODEL_DIR)
+BOUNDARIES = BoundaryStore(BOUNDARY_DIR)
+GEOMETRY = GeometryCache(lambda iso: BOUNDARIES.load(iso, 'ADM1'))
+EXECUTORS: dict[str, StageExecutor] = {}
+# Warm-up order; each route waits only for the component it reads.
+READINESS = Readiness(['countries', 'data', 'correlations', 'geometry'])
+STOP_WARM_UP = threading.Event()
+WARM_UP_ATTEMPTS = 5
+WARM_UP_BACKOFF = 0.5
+LOGGER = logging.getLogger(__name__)
+
+def offload_regions(iso: str, lod: int, geo_format: str) -> dict | None:
+    return EXECUTORS['snapshot'].run_process(
+        build_regions_payload, BOUNDARY_DIR, iso, lod, geo_format
+    )
+
+LOD_CACHE = LodCache(GEOMETRY,
+                     offload=offload_regions if SNAPSHOT_PROCESSES else None)
+VERSIONS: dict[str, str] = {}
+SNAPSHOT_CACHE = ResponseCache(max_bytes=SNAPSHOT_CACHE_BYTES)
 LIFESPAN_OBJS: list[dict[str,Any]] = []
 ORIGINS = [
     'https://civil-analysis.com',
@@ -41,27 +140,142 @@ ORIGINS = [
     'http://127.0.0.1',
     'http://127.0.0.1:5173']
 
+def load_state() -> tuple[dict[str, pl.DataFrame], CompiledForest]:
+    """Build every frame the server needs and the compiled model."""
+    frames: dict[str, pl.DataFrame] = {}
+    raw_acled, frames['clean_acled'] = load_acled(ACLED_CSV)
+    frames['oecd'] = clean_oecd(OECD_CSV)
+    frames['data'] = build_dataset(acled_csv=ACLED_CSV,
+                                   oecd_csv=OECD_CSV,
+                                   data_csv=DATA_CSV,
+                                   incidents=frames['clean_acled'],
+                                   oecd=frames['oecd'])
+    frames['raw_acled'] = build_acled_index(raw_acled).df
+    data = frames['data']
+    # Never trains; models come from the offline training CLI.
+    key = data_hash(data)
+    forest = REGISTRY.load_forest(key)
+    frames['predictions'] = load_prediction_table(
+        data,
+        forest,
+        REGISTRY.artifact_path(key),
+        data_version=file_version(store_path(DATA_CSV)),
+    )
+    return frames, forest
+
+def preload_version() -> str:
+    # Bump PRELOAD_LAYOUT when the shape of the preloaded frames changes.
+    # Keyed on the sources, .csv or the shipped .csv.xz, so a new archive
+    # invalidates the preload just as it makes the store stale.
+    sources = [path for csv in (OECD_CSV, ACLED_CSV, DATA_CSV)
+               for path in (csv, f'{csv}.xz')]
+    files = file_version(*sources, REGISTRY.index_path)
+    return f'{PRELOAD_LAYOUT}-{files}'
+
+def load_data() -> None:
+    if PRELOAD:
+        # One worker builds; the rest map the same files read-only.
+        with timed_load('preload'):
+            frames, MODELS['forest'] = attach_or_build(PRELOAD_DIR,
+                                                       preload_version,
+                                                       load_state)
+    else:
+        with timed_load('load_state'):
+            frames, MODELS['forest'] = load_state()
+    # load_state stores raw_acled already cleaned and sorted.
+    with timed_load('acled_index'):
+        INDEXES['acled'] = build_partition_index(frames['raw_acled'],
+                                                 presorted=True)
+    DATAFRAMES.update(frames)
+    record_frames(DATAFRAMES)
+    CUBES['acled'] = CubeCache(GEOMETRY, INDEXES['acled'])
+    with timed_load('prediction_index'):
+        INDEXES['predictions'] = build_partition_index(
+            DATAFRAMES['predictions']
+        )
+    VERSIONS['snapshot'] = file_version(store_path(ACLED_CSV),
+                                        store_path(DATA_CSV),
+                                        REGISTRY.index_path)
+
+def load_correlations() -> None:
+    data_version = file_version(store_path(DATA_CSV))
+    DATAFRAMES['correlations'] = load_correlation_table(DATAFRAMES['data'],
+                                                        data_version)
+    record_frames(DATAFRAMES)
+    VERSIONS['correlations'] = data_version
+
+def warm_geometry() -> None:
+    """Build every country's cube, and with it its boundaries.
+
+    Raises FileNotFoundError naming the countries with no stored
+    boundaries, so readiness reports them rather than passing.
+    """
+    # Pay for altair here rather than on the first snapshot.
+    importlib.import_module('civil_unrest_correlation_analysis.viz.chart')
+    missing = []
+    for iso in sorted(COUNTRIES):
+        if STOP_WARM_UP.is_set():
+            return
+        if GEOMETRY.get(iso) is None:
+            missing.append(iso)
+        else:
+            CUBES['acled'].get(iso)
+    if missing:
+        raise FileNotFoundError(
+            f'No boundaries stored for ISO {", ".join(missing)}; run '
+            'python -m civil_unrest_correlation_analysis.utils.boundaries'
+        )
+
+def warm_countries() -> None:
+    COUNTRIES.update(load_countries(ACLED_CSV))
+
+def warm_up() -> None:
+    """Staged start-up: each stage makes more of the API servable."""
+    stages = [('countries', warm_countries),
+              ('data', load_data),
+              ('correlations', load_correlations),
+              ('geometry', warm_geometry)]
+    try:
+        for component, load in stages:
+            # Retried, so a transient error (a worker racing another on a
+            # shared file) does not leave the component failed for good.
+            with timed_load(component):
+                READINESS.run(component,
+                              load,
+                              attempts=WARM_UP_ATTEMPTS,
+                              backoff=WARM_UP_BACKOFF,
+                              stop=STOP_WARM_UP)
+    except Exception:
+        LOGGER.exception('Warm-up failed')
+
+def require(component: str) -> None:
+    if not READINESS.is_ready(component):
+        raise HTTPException(status_code=503,
+                            detail=f'{component} is not ready',
+                            headers={'Retry-After': '1'})
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    DATAFRAMES['raw_acled'] = raw_acled(ACLED_CSV)
-    DATAFRAMES['clean_acled'] = clean_acled(ACLED_CSV)
-    DATAFRAMES['oecd'] = clean_oecd(OECD_CSV)
-    DATAFRAMES['data'] = build_dataset(acled_csv=ACLED_CSV,
-                                       oecd_csv=DATA_CSV,
-                                       data_csv=DATA_CSV)
-    LIFESPAN_OBJS.append(DATAFRAMES)
-    if DATAFRAMES.get('raw_acled') is not None:
-        COUNTRIES.update(build_countries_dict(DATAFRAMES['raw_acled']))
-        COUNTRIES_GEO.update(build_geojson_dict(COUNTRIES))
-        LIFESPAN_OBJS.append(COUNTRIES)
-    data = DATAFRAMES['data']
-    X = data.drop(['iso', 'year_month', 'incidents'])  # noqa: N806
-    y = data['incidents']
-    X_train, _, y_train, _ = train_test_split(X, y, random_state=42)  # noqa: N806
-    MODELS['pipe'] = import_pipeline(X_train, y_train, MODEL_PKL)
+    EXECUTORS['snapshot'] = StageExecutor(threads=SNAPSHOT_THREADS,
+                                          processes=SNAPSHOT_PROCESSES,
+                                          queue_depth=SNAPSHOT_QUEUE_DEPTH)
+    LIFESPAN_OBJS.extend([DATAFRAMES, INDEXES, MODELS, COUNTRIES, CUBES,
+                          VERSIONS])
+    READINESS.reset()
+    STOP_WARM_UP.clear()
+    # Serve health checks at once; data loads in the background.
+    warming = asyncio.create_task(asyncio.to_thread(warm_up))
     yield
+    STOP_WARM_UP.set()
+    await warming
+    EXECUTORS.pop('snapshot').shutdown()
     for obj in LIFESPAN_OBJS:
         obj.clear()
+    LIFESPAN_OBJS.clear()
+    READINESS.reset()
+    GEOMETRY.clear()
+    LOD_CACHE.clear()
+    SNAPSHOT_CACHE.clear()
 
 app = FastAPI(lifespan=lifespan)
 app.add_middleware(
@@ -71,35 +285,302 @@ app.add_middleware(
     allow_methods=['*'],
     allow_headers=['*'],
 )
+@app.middleware('http')
+async def instrument(request: Request, call_next):
+    started = time.perf_counter()
+    with collect_spans() as spans:
+        response = await call_next(request)
+    elapsed = time.perf_counter() - started
+    route = request.scope.get('route')
+    REQUEST_SECONDS.observe(elapsed,
+                            route=getattr(route, 'path', 'unmatched'),
+                            status=str(response.status_code))
+    if spans:
+        response.headers['Server-Timing'] = server_timing(
+            [*spans, ('total', elapsed)]
+        )
+    return response
+
+@app.get('/metrics', response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    return PlainTextResponse(render_metrics(),
+                             media_type='text/plain; version=0.0.4')
+
+@app.get('/healthz')
+async def healthz() -> dict[str, str]:
+    return {'status': 'ok'}
+
+@app.get('/readyz', response_model=ReadinessResponse)
+async def readyz() -> JSONResponse:
+    components, errors = READINESS.states()
+    ready = READINESS.is_ready()
+    body = ReadinessResponse(ready=ready,
+                             components=components,
+                             errors=errors)
+    return JSONResponse(body.model_dump(), status_code=200 if ready else 503)
+
 @app.get('/countries', response_model=list[CountryMeta])
 async def list_countries() -> list[CountryMeta]:
-    if not COUNTRIES:
-        raise HTTPException(status_code=500, detail='Countries not loaded')
+    require('countries')
     return sorted(COUNTRIES.values(), key=lambda c: c.name)
 
+def cached_response(request: Request, cached: CachedBody) -> Response:
+    headers = {'ETag': cached.etag, 'Cache-Control': 'no-cache'}
+    if etag_matches(request.headers.get('if-none-match'), cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body,
+                    media_type='application/json',
+                    headers=headers)
+
+def render_snapshot(key: tuple,
+                    acled: PartitionIndex,
+                    iso: str,
+                    start: str,
+                    end: str,
+                    lod: int,
+                    geo_format: str,
+                    offset: int,
+                    limit: int | None,
+                    submitted: float) -> CachedBody | None:
+    record_span('queue', time.perf_counter() - submitted)
+    with profile_if_slow('snapshot', SLOW_SNAPSHOT_SECONDS, PROFILE_DIR):
+        with span('geometry'):
+            if GEOMETRY.get(iso) is None:
+                return None
+        response = build_snapshot(lods=LOD_CACHE,
+                                  cubes=CUBES['acled'],
+                                  acled_index=acled,
+                                  prediction_index=INDEXES['predictions'],
+                                  iso=iso,
+                                  start=start,
+                                  end=end,
+                                  lod=lod,
+                                  geo_format=geo_format,
+                                  offset=offset,
+                                  limit=limit)
+        with span('serialize'):
+            return SNAPSHOT_CACHE.put(key,
+                                      response.model_dump_json().encode())
+
 @app.get('/snapshot', response_model=SnapshotResponse)
 async def snapshot(
+    request: Request,
     iso: str = Query(...,
                      min_length=3,
                      max_length=3,
                      description='Numeric ISO code'),
     start: str = Query(...,
-                       regex=r"^\d{4}-\d{2}$"),
+                       regex=YEAR_MONTH),
     end: str = Query(...,
-                     regex=r"^\d{4}-\d{2}$")
-) -> SnapshotResponse:
-    acled = DATAFRAMES['raw_acled']
-    if acled is None:
-        raise HTTPException(status_code=500, detail='Data not loaded')
+                     regex=YEAR_MONTH),
+    lod: int = Query(0,
+                     ge=0,
+                     le=max(LODS),
+                     description='Geometry level of detail, 0 is full'),
+    geo_format: Literal['geojson', 'topojson'] = Query('geojson'),
+    limit: int | None = Query(None,
+                              ge=1,
+                              le=MAX_PAGE_SIZE,
+                              description='Events per page; all if omitted'),
+    cursor: str | None = Query(None,
+                               description='next_cursor from a previous page')
+) -> Response:
+    require('data')
+    acled = INDEXES['acled']
     country_meta = COUNTRIES.get(iso)
     if country_meta is None:
         raise HTTPException(status_code=404, detail=f'Unknown ISO {iso}')
-    data = DATAFRAMES['data']
-    pipe = MODELS['pipe']
-    return build_snapshot(countries_geo=COUNTRIES_GEO,
-                          acled_df=acled,
-                          pipe=pipe,
-                          data=data,
-                          iso=iso,
-                          start=start,
-                          end=end)
+    try:
+        offset = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    key = (VERSIONS.get('snapshot'), iso, start, end, lod, geo_format,
+           offset, limit)
+    with span('cache'):
+        cached = SNAPSHOT_CACHE.get(key)
+    if cached is None:
+        try:
+            with EXECUTORS['snapshot'].admit():
+                cached = await EXECUTORS['snapshot'].run(render_snapshot,
+                                                         key,
+                                                         acled,
+                                                         iso,
+                                                         start,
+                                                         end,
+                                                         lod,
+                                                         geo_format,
+                                                         offset,
+                                                         limit,
+                                                         time.perf_counter())
+        except Overloaded as e:
+            raise HTTPException(status_code=503,
+                                detail=str(e),
+                                headers={'Retry-After': '1'}) from e
+        if cached is None:
+            raise HTTPException(status_code=503,
+                                detail=f'No boundaries stored for ISO {iso}')
+    return cached_response(request, cached)
+
+def render_comparison(key: tuple,
+                      countries: list[CountryMeta],
+                      maps: list[tuple[dict, list[dict]] | None],
+                      start: str,
+                      end: str,
+                      geo_format: str) -> CachedBody:
+    response = build_comparison(prediction_index=INDEXES['predictions'],
+                                countries=countries,
+                                maps=maps,
+                                start=start,
+                                end=end,
+                                geo_format=geo_format)
+    with span('serialize'):
+        return SNAPSHOT_CACHE.put(key, response.model_dump_json().encode())
+
+@app.get('/compare', response_model=ComparisonResponse)
+async def compare(
+    request: Request,
+    iso: list[str] = Query(...,
+                           description='Numeric ISO codes, repeated, up to '
+                                       f'{MAX_COMPARE_COUNTRIES}'),
+    start: str = Query(...,
+                       regex=YEAR_MONTH),
+    end: str = Query(...,
+                     regex=YEAR_MONTH),
+    lod: int = Query(0,
+                     ge=0,
+                     le=max(LODS),
+                     description='Geometry level of detail, 0 is full'),
+    geo_format: Literal['geojson', 'topojson'] = Query('geojson'),
+) -> Response:
+    require('data')
+    isos = list(dict.fromkeys(iso))
+    if len(isos) > MAX_COMPARE_COUNTRIES:
+        raise HTTPException(status_code=400,
+                            detail=f'At most {MAX_COMPARE_COUNTRIES} countries')
+    unknown = [code for code in isos if code not in COUNTRIES]
+    if unknown:
+        raise HTTPException(status_code=404,
+                            detail=f'Unknown ISO {", ".join(unknown)}')
+    key = ('compare', VERSIONS.get('snapshot'), tuple(isos), start, end, lod,
+           geo_format)
+    with span('cache'):
+        cached = SNAPSHOT_CACHE.get(key)
+    if cached is None:
+        executor = EXECUTORS['snapshot']
+        try:
+            with executor.admit():
+                # Each country's map stages run side by side on the pool.
+                maps = await asyncio.gather(*(
+                    executor.run(build_country_map, LOD_CACHE, CUBES['acled'],
+                                 code, start, end, lod, geo_format)
+                    for code in isos
+                ))
+                cached = await executor.run(render_comparison,
+                                            key,
+                                            [COUNTRIES[code] for code in isos],
+                                            maps,
+                                            start,
+                                            end,
+                                            geo_format)
+        except Overloaded as e:
+            raise HTTPException(status_code=503,
+                                detail=str(e),
+                                headers={'Retry-After': '1'}) from e
+    return cached_response(request, cached)
+
+def render_correlations(key: tuple,
+                        iso: str | None,
+                        method: str,
+                        features: list[str] | None,
+                        min_lag: int,
+                        max_lag: int) -> CachedBody:
+    table = DATAFRAMES['correlations'].filter(
+        pl.col('method') == method,
+        pl.col('iso').is_null() if iso is None else pl.col('iso') == iso,
+        pl.col('lag').is_between(min_lag, max_lag),
+    )
+    if features is not None:
+        table = table.filter(pl.col('feature').is_in(features))
+    response = CorrelationResponse(
+        iso=iso,
+        method=method,
+        correlations=[Correlation(**row) for row in
+                      table.select('feature', 'lag', 'n', 'r').iter_rows(
+                          named=True)],
+    )
+    return SNAPSHOT_CACHE.put(key, response.model_dump_json().encode())
+
+@app.get('/correlations', response_model=CorrelationResponse)
+async def correlations(
+    request: Request,
+    iso: str | None = Query(None,
+                            min_length=3,
+                            max_length=3,
+                            description='Numeric ISO code; pooled if omitted'),
+    method: Literal['pearson', 'spearman'] = Query('pearson'),
+    feature: list[str] | None = Query(None,
+                                      description='OECD features, repeated; '
+                                                  'all if omitted'),
+    min_lag: int = Query(0,
+                         ge=0,
+                         le=MAX_LAG,
+                         description='Months the feature leads incidents by'),
+    max_lag: int = Query(MAX_LAG,
+                         ge=0,
+                         le=MAX_LAG),
+) -> Response:
+    require('correlations')
+    if iso is not None and iso not in COUNTRIES:
+        raise HTTPException(status_code=404, detail=f'Unknown ISO {iso}')
+    if min_lag > max_lag:
+        raise HTTPException(status_code=400,
+                            detail='min_lag is greater than max_lag')
+    features = list(dict.fromkeys(feature)) if feature else None
+    if features is not None:
+        known = set(DATAFRAMES['correlations']['feature'].unique())
+        unknown = [name for name in features if name not in known]
+        if unknown:
+            raise HTTPException(status_code=404,
+                                detail=f'Unknown feature {", ".join(unknown)}')
+    key = ('correlations', VERSIONS.get('correlations'), iso, method,
+           tuple(features) if features else None, min_lag, max_lag)
+    cached = SNAPSHOT_CACHE.get(key)
+    if cached is None:
+        cached = await asyncio.to_thread(render_correlations, key, iso, method,
+                                         features, min_lag, max_lag)
+    return cached_response(request, cached)
+
+@app.get('/events')
+async def events(
+    iso: str = Query(...,
+                     min_length=3,
+                     max_length=3,
+                     description='Numeric ISO code'),
+    start: str = Query(...,
+                       regex=YEAR_MONTH),
+    end: str = Query(...,
+                     regex=YEAR_MONTH)
+) -> StreamingResponse:
+    require('data')
+    acled = INDEXES['acled']
+    if iso not in COUNTRIES:
+        raise HTTPException(status_code=404, detail=f'Unknown ISO {iso}')
+    executor = EXECUTORS['snapshot']
+    try:
+        with executor.admit():
+            # The slice and its date formatting stay off the event loop.
+            acled_slice = await executor.run(build_filtered_acled_events,
+                                             acled,
+                                             iso,
+                                             start,
+                                             end)
+    except Overloaded as e:
+        raise HTTPException(status_code=503,
+                            detail=str(e),
+                            headers={'Retry-After': '1'}) from e
+    return StreamingResponse(iter_events_ndjson(acled_slice),
+                             media_type='application/x-ndjson')
+
+if __name__ == '__main__':
+    # Materialize the preload files before starting the workers.
+    attach_or_build(PRELOAD_DIR, preload_version, load_state)
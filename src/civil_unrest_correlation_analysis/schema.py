@@ -21,10 +21,37 @@ class OecdMetric(BaseModel):
     value: float
 
 
+class ReadinessResponse(BaseModel):
+    ready: bool
+    components: dict[str, str]
+    errors: dict[str, str] = {}
+
+
+class Correlation(BaseModel):
+    feature: str
+    lag: int
+    n: int
+    r: float | None = None
+
+
+class CorrelationResponse(BaseModel):
+    iso: str | None = None
+    method: str
+    correlations: list[Correlation]
+
+
+class ComparisonResponse(BaseModel):
+    start: str
+    end: str
+    countries: list[CountryMeta]
+    map_spec: dict[str, Any]
+
+
 class SnapshotResponse(BaseModel):
     iso: str
     country: str
     start: str
     end: str
     acled_events: list[AcledEvent]
+    next_cursor: str | None = None
     map_spec: dict[str, Any]
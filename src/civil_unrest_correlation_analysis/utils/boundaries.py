@@ -0,0 +1,185 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any
+
+from civil_unrest_correlation_analysis.utils.store import scan_store
+
+BOUNDARY_DIR = 'data/boundaries'
+BOUNDARY_API = 'https://www.geoboundaries.org/api/current/gbOpen/{iso3}/{adm}/'
+
+
+class BoundaryStore:
+    """Content-addressed GeoJSON store with an (iso, adm) -> sha256 index."""
+
+    def __init__(self, root: str | Path = BOUNDARY_DIR):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._index: dict[str, str] | None = None
+        self._index_mtime: int | None = None
+
+    @staticmethod
+    def key(iso: str, adm: str) -> str:
+        return f'{iso}/{adm}'
+
+    @property
+    def index_path(self) -> Path:
+        return self.root / 'index.json'
+
+    def object_path(self, digest: str) -> Path:
+        return self.root / 'objects' / digest[:2] / f'{digest}.geojson'
+
+    def _refresh(self) -> dict[str, str]:
+        """Re-read index.json when it changed on disk; hold the lock."""
+        try:
+            mtime = self.index_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if self._index is None or mtime != self._index_mtime:
+            self._index = (json.loads(self.index_path.read_text())
+                           if mtime is not None else {})
+            self._index_mtime = mtime
+        return self._index
+
+    def index(self) -> dict[str, str]:
+        # Stat per call so a populate run after start-up is picked up.
+        with self._lock:
+            return self._refresh()
+
+    def has(self, iso: str, adm: str = 'ADM1') -> bool:
+        digest = self.index().get(self.key(iso, adm))
+        return digest is not None and self.object_path(digest).exists()
+
+    def load(self, iso: str, adm: str = 'ADM1') -> dict[str, Any] | None:
+        digest = self.index().get(self.key(iso, adm))
+        if digest is None:
+            return None
+        path = self.object_path(digest)
+        if not path.exists():
+            return None
+        return json.loads(path.read_bytes())
+
+    def put(self, iso: str, adm: str, content: bytes) -> str:
+        digest = hashlib.sha256(content).hexdigest()
+        path = self.object_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix('.tmp')
+            tmp_path.write_bytes(content)
+            os.replace(tmp_path, path)
+        with self._lock:
+            index = dict(self._refresh())
+            index[self.key(iso, adm)] = digest
+            tmp_index = self.index_path.with_suffix(f'.{os.getpid()}.tmp')
+            tmp_index.write_text(json.dumps(index, indent=1, sort_keys=True))
+            os.replace(tmp_index, self.index_path)
+            self._index = index
+            self._index_mtime = self.index_path.stat().st_mtime_ns
+        return digest
+
+
+def _get(url: str, timeout: float) -> bytes:
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.read()
+
+
+def fetch_boundary(iso: str,
+                   adm: str = 'ADM1',
+                   api: str = BOUNDARY_API,
+                   timeout: float = 60) -> bytes:
+    import pycountry
+
+    country = pycountry.countries.get(numeric=iso)
+    if country is None:
+        raise ValueError(f'Unknown numeric ISO {iso}')
+    meta = json.loads(_get(api.format(iso3=country.alpha_3, adm=adm), timeout))
+    return _get(meta['gjDownloadURL'], timeout)
+
+
+def fetch_with_retry(iso: str,
+                     adm: str,
+                     api: str,
+                     retries: int,
+                     backoff: float,
+                     timeout: float) -> bytes:
+    attempt = 0
+    while True:
+        try:
+            return fetch_boundary(iso, adm, api, timeout)
+        except Exception:
+            if attempt >= retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+            attempt += 1
+
+
+def populate(store: BoundaryStore,
+             isos: list[str],
+             adm: str = 'ADM1',
+             api: str = BOUNDARY_API,
+             workers: int = 8,
+             retries: int = 3,
+             backoff: float = 1.0,
+             timeout: float = 60,
+             force: bool = False) -> dict[str, str]:
+    """Fetch missing boundaries concurrently; return iso -> error message."""
+    todo = [iso for iso in isos if force or not store.has(iso, adm)]
+    errors = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(fetch_with_retry, iso, adm, api,
+                        retries, backoff, timeout): iso
+            for iso in todo
+        }
+        for future in as_completed(futures):
+            iso = futures[future]
+            try:
+                store.put(iso, adm, future.result())
+            except Exception as e:
+                errors[iso] = str(e)
+    return errors
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description='Populate the on-disk GeoJSON boundary store.'
+    )
+    parser.add_argument('--iso', nargs='*',
+                        help='Numeric ISO codes; defaults to every ACLED iso')
+    parser.add_argument('--acled-csv', default='data/final/acled.csv')
+    parser.add_argument('--adm', default='ADM1')
+    parser.add_argument('--root', default=BOUNDARY_DIR)
+    parser.add_argument('--api', default=BOUNDARY_API,
+                        help='Metadata URL template with {iso3} and {adm}')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--retries', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--force', action='store_true')
+    args = parser.parse_args(argv)
+
+    isos = args.iso
+    if not isos:
+        isos = (scan_store(args.acled_csv).select('iso').unique()
+                .collect()['iso'].drop_nulls().to_list())
+    errors = populate(BoundaryStore(args.root),
+                      sorted(isos),
+                      adm=args.adm,
+                      api=args.api,
+                      workers=args.workers,
+                      retries=args.retries,
+                      timeout=args.timeout,
+                      force=args.force)
+    for iso, error in sorted(errors.items()):
+        print(f'{iso}: {error}')
+    if errors:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
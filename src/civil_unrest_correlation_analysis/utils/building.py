@@ -1,76 +1,112 @@
+import base64
 import os
-from typing import Any
+from collections.abc import Iterator
 
-import geopandas as gpd
 import polars as pl
-import pycountry
-from geoacled.chart import Choropleth
-from geoacled.geojson import build_geo_df
-from geoacled.utils.clean import clean_column
-from geoacled.utils.fetch import fetch_geojson
-from shapely import Point
 
 from civil_unrest_correlation_analysis.schema import (
     AcledEvent,
+    ComparisonResponse,
     CountryMeta,
     SnapshotResponse,
 )
 from civil_unrest_correlation_analysis.utils.cleaning import (
-    clean_acled,
+    ACLED_COLUMNS,
+    NOTES_PATH,
+    acled_incidents,
     clean_oecd,
+    compact_acled,
+    join_features,
+    load_acled,
+    scan_acled,
 )
-from civil_unrest_correlation_analysis.utils.compression import (
-    check_file_compression,
-    compress,
-    decompress,
+from civil_unrest_correlation_analysis.utils.compression import compress
+from civil_unrest_correlation_analysis.utils.cube import (
+    CubeCache,
+    region_counts,
 )
-from civil_unrest_correlation_analysis.viz.chart import (
-    choropleth,
-    concat_chart,
-    prediction_line_chart,
+from civil_unrest_correlation_analysis.utils.incremental import refresh_dataset
+from civil_unrest_correlation_analysis.utils.index import (
+    PartitionIndex,
+    build_partition_index,
+    slice_partition,
+    slice_partitions,
 )
+from civil_unrest_correlation_analysis.utils.metrics import span
+from civil_unrest_correlation_analysis.utils.store import (
+    scan_store,
+    write_mapped_column,
+    write_store,
+)
+from civil_unrest_correlation_analysis.utils.topology import LodCache
+
+
+EVENT_COLUMNS = list(AcledEvent.model_fields)
+
+def build_acled_index(acled_df: pl.DataFrame,
+                      notes_path: str = NOTES_PATH) -> PartitionIndex:
+    from geoacled.utils.clean import clean_column
 
+    df = clean_column(acled_df, 'ADM1').sort(['iso', 'year_month'],
+                                            maintain_order=True)
+    notes = write_mapped_column(df['notes'], notes_path)
+    return build_partition_index(compact_acled(df).hstack([notes]),
+                                 presorted=True)
 
 def build_filtered_acled_events(
-    df: pl.DataFrame,
+    index: PartitionIndex,
     iso: str,
     start: str,
     end: str
     ) -> pl.DataFrame:
-    return df.with_columns(
-      pl.col('event_date')
-      .str.to_date()
-      .dt.strftime("%Y-%m")
-      .alias('year_month')).filter(
-        (pl.col("iso") == iso)
-        & (pl.col("year_month") >= start)
-        & (pl.col("year_month") <= end)
-    ).select(
+    return slice_partition(index, iso, start, end).select(
         [
-            "iso",
-            "year_month",
-            "event_date",
-            "admin1",
-            "location",
-            "event_type",
-            "sub_event_type",
+            pl.col("iso").cast(pl.String),
+            pl.col("date").dt.strftime("%Y-%m").alias("year_month"),
+            pl.col("date").dt.strftime("%Y-%m-%d").alias("event_date"),
+            pl.col("admin1").cast(pl.String),
+            pl.col("location").cast(pl.String),
+            pl.col("event_type").cast(pl.String),
+            pl.col("sub_event_type").cast(pl.String),
             "fatalities",
             "notes",
-            'latitude',
-            'longitude'
+            # ACLED publishes four decimals; undo the Float32 rounding.
+            pl.col('latitude').cast(pl.Float64).round(4),
+            pl.col('longitude').cast(pl.Float64).round(4),
         ]
     )
 
 def build_acled_events_dict(acled_df) -> list[AcledEvent]:
     return [AcledEvent(**row) for row in acled_df.to_dicts()]
 
-def build_geojson_dict(countries: dict[str, CountryMeta]):
-    geo_dict = {}
-    for iso in countries:
-        country = pycountry.countries.get(numeric=iso)
-        geo, _ = fetch_geojson(country.name, adm='ADM1')
-        geo_dict[iso] = geo
-    return geo_dict
+def encode_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(f'o:{offset}'.encode()).decode()
+
+def decode_cursor(cursor: str | None) -> int:
+    if not cursor:
+        return 0
+    try:
+        prefix, offset = base64.urlsafe_b64decode(cursor).decode().split(':')
+        if prefix != 'o' or int(offset) < 0:
+            raise ValueError(cursor)
+        return int(offset)
+    except Exception as e:
+        raise ValueError(f'Invalid cursor {cursor!r}') from e
+
+def page_events(acled_slice: pl.DataFrame,
+                offset: int = 0,
+                limit: int | None = None) -> tuple[pl.DataFrame, str | None]:
+    page = acled_slice.slice(offset, limit)
+    end = offset + page.height
+    next_cursor = encode_cursor(end) if end < acled_slice.height else None
+    return page, next_cursor
+
+def iter_events_ndjson(acled_slice: pl.DataFrame,
+                       chunk_rows: int = 5000) -> Iterator[bytes]:
+    events = acled_slice.select(EVENT_COLUMNS)
+    for chunk in events.iter_slices(n_rows=chunk_rows):
+        yield chunk.write_ndjson().encode()
+
 def build_countries_dict(acled_df: pl.DataFrame) -> dict[str, CountryMeta]:
     countries = {}
     for row in acled_df.select(['iso', 'country']).unique().iter_rows(named=True):
@@ -80,148 +116,167 @@ def build_countries_dict(acled_df: pl.DataFrame) -> dict[str, CountryMeta]:
         )
     return countries
 
+def load_countries(filepath: str) -> dict[str, CountryMeta]:
+    """Countries from two columns of the ACLED store, before the index."""
+    return build_countries_dict(
+        scan_store(filepath).select(['iso', 'country']).unique().collect()
+    )
+
 def raw_acled(filepath: str) -> pl.DataFrame:
-    file = check_file_compression(filepath)
-    return pl.read_csv(file, schema_overrides={'iso': pl.String})
+    return scan_acled(filepath).select(
+        ACLED_COLUMNS + ['date', 'year_month']
+    ).collect()
 
 def build_dataset(
     oecd_csv: str,
     acled_csv: str,
     data_csv: str,
     read_data_csv: bool = True,
+    incidents: pl.DataFrame | pl.LazyFrame | None = None,
+    oecd: pl.DataFrame | None = None,
+    incremental: bool = False,
 ) -> pl.DataFrame:
     compressed_oecd = f"{oecd_csv}.xz"
     compressed_acled = f"{acled_csv}.xz"
     compressed_data = f"{data_csv}.xz"
 
     if read_data_csv:
-        if os.path.exists(data_csv):
-            return pl.read_csv(data_csv, schema_overrides={'iso': pl.String})
-
-        if os.path.exists(compressed_data):
-            try:
-                decompress(compressed_data)
-            except Exception as e:
-                raise FileNotFoundError(
-                    f"Neither {data_csv} nor {compressed_data} could be used"
-                ) from e
-
-        if not os.path.exists(data_csv):
+        try:
+            return scan_store(data_csv).collect()
+        except Exception as e:
             raise FileNotFoundError(
-                f"Neither {data_csv} nor {compressed_data} exists"
-            )
+                f"Neither {data_csv} nor {compressed_data} could be used"
+            ) from e
 
-        return pl.read_csv(data_csv, schema_overrides={'iso': pl.String})
-
-    for raw, comp in [(oecd_csv, compressed_oecd), (acled_csv, compressed_acled)]:
-        if not os.path.exists(raw):
-            if os.path.exists(comp):
-                try:
-                    decompress(comp) 
-                except Exception as e:
-                    raise FileNotFoundError(
-                        f"Failed to decompress {comp} to {raw}"
-                    ) from e
-            else:
-                raise FileNotFoundError(
-                    f"Missing both {raw} and {comp}"
-                )
-
-    if not os.path.exists(compressed_oecd):
-        compress(oecd_csv)
-    if not os.path.exists(compressed_acled):
-        compress(acled_csv)
-    
-    data = clean_acled(acled_csv).join(
-        clean_oecd(oecd_csv),
-        on=["year_month", "iso"],
-        how="left",
-    )
-    base_cols = ['iso', 'year_month', 'incidents']
-    feature_cols = sorted([c for c in data.columns if c not in base_cols])
+    if incremental:
+        data, _ = refresh_dataset(oecd_csv, acled_csv, data_csv)
+        return data
+
+    sources = []
+    if oecd is None:
+        sources.append((oecd_csv, compressed_oecd))
+    if incidents is None:
+        sources.append((acled_csv, compressed_acled))
+    for raw, comp in sources:
+        if os.path.exists(raw):
+            if not os.path.exists(comp):
+                compress(raw)
+        elif not os.path.exists(comp):
+            raise FileNotFoundError(
+                f"Missing both {raw} and {comp}"
+            )
 
-    data = data.select(base_cols + feature_cols)
+    if incidents is None:
+        incidents = acled_incidents(scan_acled(acled_csv))
+    if oecd is None:
+        oecd = clean_oecd(oecd_csv)
+    data = join_features(incidents, oecd)
 
     data.write_csv(data_csv)
     if not os.path.exists(compressed_data):
         compress(data_csv)
+    write_store(data, data_csv)
 
     return data
 
-def build_choropleth(geojson: dict[str, Any],
-                     acled_df: pl.DataFrame,
-                     country: str,
-                     start: str,
-                     end: str) -> Choropleth:
-    geo_df = build_geo_df(geojson)
-    pdf = acled_df.to_pandas()
-
-    geometry = [
-        Point(lon, lat)
-        for lon, lat in zip(pdf["longitude"], pdf["latitude"])
-    ]
-
-    points_gdf = gpd.GeoDataFrame(
-        pdf,
-        geometry=geometry,
-        crs="EPSG:4326",
-    )
-    geo_df = geo_df.to_crs(points_gdf.crs)
-
-    joined = gpd.sjoin(
-        points_gdf,
-        geo_df,
-        how="left",
-        predicate="within",
-    )
-    counts = (
-        joined
-        .groupby("shapeName")
-        .size()
-        .reset_index(name="incident_count")
-    )        
-    incident_count_df = pl.from_pandas(counts)
-    incident_count_df = incident_count_df.rename({'incident_count': 'Number of incidents'})
-    return Choropleth(
-    title='',
-    lookup_df=incident_count_df,
-    lookup_column="shapeName",
-    geo_df=geo_df,
-    geojson_id="shapeName",
-    basemap_color_column='Number of incidents',
-    basemap_color_scheme='reds',
-    basemap_tooltips={'shapeName': 'Region',
-                      'Number of incidents': 'Number of incidents'}
-)
-def filter_data(data: pl.DataFrame, iso, start, end) -> pl.DataFrame:
-    print(data.schema)
-    print(type(iso), iso)
-    return data.with_columns().filter((pl.col('iso') == iso) & (pl.col('year_month') >=  start) & (pl.col('year_month') <= end))
-def build_snapshot(countries_geo,
-                   acled_df,
-                   pipe,
-                   data,
+def filter_data(index: PartitionIndex, iso, start, end) -> pl.DataFrame:
+    return slice_partition(index, iso, start, end)
+def build_snapshot(lods: LodCache,
+                   cubes: CubeCache,
+                   acled_index: PartitionIndex,
+                   prediction_index: PartitionIndex,
                    iso,
                    start,
-                   end) -> SnapshotResponse:
+                   end,
+                   lod: int = 0,
+                   geo_format: str = 'geojson',
+                   offset: int = 0,
+                   limit: int | None = None) -> SnapshotResponse:
+    # altair is slow to import; main warms it up in the background.
+    from civil_unrest_correlation_analysis.viz.chart import (
+        counts_dataset,
+        line_dataset,
+        render_spec,
+    )
+    import pycountry
+
     country = pycountry.countries.get(numeric=iso).name
-    clean_acled = clean_column(acled_df.filter(pl.col('iso') == iso), 'ADM1')
-    acled_slice = build_filtered_acled_events(clean_acled, iso, start, end)
-    acled_dict = build_acled_events_dict(acled_slice)
-    filtered_data = filter_data(data, iso, start, end)
-    line = prediction_line_chart(filtered_data, pipe)
-    choropleth_obj = choropleth(countries_geo.get(iso),
-                                   acled_slice,
-                                   country,
-                                   start,
-                                   end)
-    chart = concat_chart(line, choropleth_obj) 
+    with span('slice'):
+        acled_slice = build_filtered_acled_events(acled_index, iso, start, end)
+    with span('events'):
+        page, next_cursor = page_events(acled_slice, offset, limit)
+        acled_dict = build_acled_events_dict(page.select(EVENT_COLUMNS))
+    with span('predictions'):
+        filtered_data = filter_data(prediction_index, iso, start, end)
+    with span('region_counts'):
+        counts = region_counts(cubes.get(iso), start, end)
+    with span('regions'):
+        regions = lods.regions(iso, lod, geo_format)
+    with span('render_spec'):
+        map_spec = render_spec(geo_format,
+                               line_dataset(filtered_data),
+                               regions,
+                               counts_dataset(counts))
     return SnapshotResponse(
         iso=iso,
         country=country,
         start=start,
         end=end,
         acled_events=acled_dict,
-        map_spec=chart.to_dict()
+        next_cursor=next_cursor,
+        map_spec=map_spec
         )
 
+def build_country_map(lods: LodCache,
+                      cubes: CubeCache,
+                      iso: str,
+                      start: str,
+                      end: str,
+                      lod: int = 0,
+                      geo_format: str = 'geojson'
+                      ) -> tuple[dict, list[dict]] | None:
+    """Map stages of one country; None when it has no boundaries."""
+    from civil_unrest_correlation_analysis.viz.chart import counts_dataset
+
+    with span('region_counts'):
+        cube = cubes.get(iso)
+        if cube is None:
+            return None
+        counts = counts_dataset(region_counts(cube, start, end))
+    with span('regions'):
+        regions = lods.regions(iso, lod, geo_format)
+    if regions is None:
+        return None
+    return regions, counts
+
+def build_comparison(prediction_index: PartitionIndex,
+                     countries: list[CountryMeta],
+                     maps: list[tuple[dict, list[dict]] | None],
+                     start: str,
+                     end: str,
+                     geo_format: str = 'geojson') -> ComparisonResponse:
+    """One spec for several countries from their build_country_map results.
+
+    Countries without boundaries still appear in the line chart.
+    """
+    from civil_unrest_correlation_analysis.viz.chart import (
+        comparison_line_dataset,
+        render_comparison_spec,
+    )
+
+    isos = [country.iso for country in countries]
+    with span('predictions'):
+        data = slice_partitions(prediction_index, isos, start, end)
+    with span('render_spec'):
+        names = {country.iso: country.name for country in countries}
+        map_spec = render_comparison_spec(
+            geo_format,
+            comparison_line_dataset(data, names),
+            [(country.iso, country.name, *country_map)
+             for country, country_map in zip(countries, maps)
+             if country_map is not None],
+        )
+    return ComparisonResponse(start=start,
+                              end=end,
+                              countries=countries,
+                              map_spec=map_spec)
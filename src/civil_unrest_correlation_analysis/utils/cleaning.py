@@ -1,31 +1,113 @@
 import polars as pl
-from civil_unrest_correlation_analysis.utils.compression import check_file_compression
-from civil_unrest_correlation_analysis.utils.misc import numeric_iso_col
+from civil_unrest_correlation_analysis.utils.misc import join_numeric_iso
+from civil_unrest_correlation_analysis.utils.store import STORE_DIR, scan_store
 
-def clean_oecd(filepath: str) -> pl.DataFrame:
-    file = check_file_compression(filepath)
-    return numeric_iso_col(pl.read_csv(file), 'REF_AREA').drop_nulls(
+OECD_KEY = ['iso', 'TIME_PERIOD', 'Measure']
+
+def scan_oecd_observations(filepath: str) -> pl.LazyFrame:
+    oecd = scan_store(filepath).select(['REF_AREA',
+                                        'TIME_PERIOD',
+                                        'Measure',
+                                        'OBS_VALUE'])
+    return join_numeric_iso(oecd, 'REF_AREA').drop_nulls(
     'iso'
-    )['iso',
-      'TIME_PERIOD',
-      'Measure',
-      'OBS_VALUE'].with_columns(
-    pl.concat_str([pl.col('TIME_PERIOD'),
-                   pl.col('iso')],
-                   separator='-')
-                   .alias('date_iso')
-                   ).unique().pivot(
+    ).select(OECD_KEY + ['OBS_VALUE'])
+
+def pivot_oecd(observations: pl.DataFrame | pl.LazyFrame) -> pl.DataFrame:
+    """Pivot measures to columns; the first listed value of a key wins.
+
+    A plain unique() used to keep an arbitrary duplicate, so values
+    could differ between runs; keeping the first is deterministic.
+    Deduplicating runs on the streaming engine, so only the long
+    (iso, month, measure) frame is ever held, not the raw SDMX rows.
+    """
+    first = observations.lazy().unique(
+        OECD_KEY, keep='first', maintain_order=True
+    ).collect(engine='streaming')
+    return first.pivot(
     index=['iso', 'TIME_PERIOD'],
     on='Measure',
     values='OBS_VALUE',
     aggregate_function='first').rename({'TIME_PERIOD': 'year_month'})
 
+def clean_oecd(filepath: str) -> pl.DataFrame:
+    return pivot_oecd(scan_oecd_observations(filepath))
+
+ACLED_COLUMNS = [
+    'iso',
+    'country',
+    'event_date',
+    'admin1',
+    'location',
+    'event_type',
+    'sub_event_type',
+    'fatalities',
+    'notes',
+    'latitude',
+    'longitude',
+]
+
+ACLED_CATEGORICAL = [
+    'iso',
+    'country',
+    'admin1',
+    'location',
+    'event_type',
+    'sub_event_type',
+]
+NOTES_PATH = f'{STORE_DIR}/acled_notes.arrow'
+
+def compact_acled(events: pl.DataFrame) -> pl.DataFrame:
+    """Dictionary-encode repeated strings and keep dates as Date.
+
+    The text event_date/year_month and the notes are dropped; they are
+    rebuilt or reattached for the rows actually returned.
+    """
+    return events.select(
+        *(pl.col(col).cast(pl.Categorical) for col in ACLED_CATEGORICAL),
+        'date',
+        pl.col('fatalities').cast(pl.Int32),
+        pl.col('latitude').cast(pl.Float32),
+        pl.col('longitude').cast(pl.Float32),
+    )
+
+def scan_acled(filepath: str) -> pl.LazyFrame:
+    return scan_store(filepath).with_columns(
+    pl.col('event_date').str.to_date().alias('date')
+    ).with_columns(
+    pl.col('date').dt.strftime("%Y-%m").alias('year_month'))
+
+def acled_incidents(acled: pl.LazyFrame) -> pl.LazyFrame:
+    return acled.select(['year_month',
+                         'iso']).group_by(['year_month',
+                               'iso']).len().rename({'len':'incidents'})
+
+def load_acled(filepath: str) -> tuple[pl.DataFrame, pl.DataFrame]:
+    """Parse ACLED once and return (events, monthly incidents)."""
+    acled = scan_acled(filepath)
+    events, incidents = pl.collect_all([
+        acled.select(ACLED_COLUMNS + ['date', 'year_month']),
+        acled_incidents(acled),
+    ])
+    return events, incidents
+
 def clean_acled(filepath: str) -> pl.DataFrame:
-    file = check_file_compression(filepath)
-    return pl.read_csv(file, schema_overrides={'iso': pl.String}).with_columns(
-    pl.col('event_date')
-    .str.to_date()
-    .dt.strftime("%Y-%m")
-    .alias('year_month')).select(['year_month',
-                                         'iso']).group_by(['year_month',
-                               'iso']).len().rename({'len':'incidents'})
\ No newline at end of file
+    return acled_incidents(scan_acled(filepath)).collect()
+
+BASE_COLUMNS = ['iso', 'year_month', 'incidents']
+
+def join_features(incidents: pl.DataFrame | pl.LazyFrame,
+                  oecd: pl.DataFrame | pl.LazyFrame) -> pl.DataFrame:
+    """Left-join OECD features onto monthly incidents, streaming.
+
+    Lazy inputs let the ACLED aggregation run out of core as well.
+    """
+    data = incidents.lazy().join(
+        oecd.lazy(),
+        on=["year_month", "iso"],
+        how="left",
+        maintain_order="left",
+    )
+    feature_cols = sorted([c for c in data.collect_schema().names()
+                           if c not in BASE_COLUMNS])
+    return data.select(BASE_COLUMNS + feature_cols).collect(engine='streaming')
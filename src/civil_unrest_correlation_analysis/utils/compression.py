@@ -1,27 +1,153 @@
 import lzma
+import mmap
 import os
-import shutil
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
 
-def check_file_compression(csv_path) -> str:
-    compressed_path = f'{csv_path}.xz'
-    if os.path.exists(csv_path):
-        return csv_path
-    try:
-        if os.path.exists(compressed_path):
-            decompress(compressed_path)
-            return csv_path
-    except Exception as e:
-        raise FileNotFoundError from e
-    return csv_path
-
-def compress(path: str | Path) -> Path:
+# Each block is a complete .xz stream. Concatenated streams are still a
+# valid .xz file, so xz, lzma.open and older checkouts read them as-is.
+BLOCK_SIZE = 32 * 1024 * 1024
+PRESET = 6
+
+_HEADER_SIZE = 12
+_FOOTER_MAGIC = b'YZ'
+
+
+@dataclass(frozen=True)
+class XzStream:
+    offset: int
+    length: int
+    uncompressed: int
+
+
+def _workers(workers: int | None) -> int:
+    return workers or os.cpu_count() or 1
+
+
+def compress(path: str | Path,
+             block_size: int = BLOCK_SIZE,
+             workers: int | None = None,
+             preset: int = PRESET) -> Path:
+    """Compress ``block_size`` chunks as independent streams on all cores."""
     path = Path(path)
     out_path = path.with_suffix(path.suffix + '.xz')
+    tmp_path = out_path.with_suffix('.xz.tmp')
+    workers = _workers(workers)
+
+    def block(data: bytes) -> bytes:
+        return lzma.compress(data, preset=preset)
+
+    with (path.open('rb') as src, tmp_path.open('wb') as dst,
+          ThreadPoolExecutor(workers) as pool):
+        # Bounded read-ahead keeps memory near workers * block_size.
+        pending: deque = deque()
+        while chunk := src.read(block_size):
+            pending.append(pool.submit(block, chunk))
+            if len(pending) >= workers * 2:
+                dst.write(pending.popleft().result())
+        while pending:
+            dst.write(pending.popleft().result())
+        if dst.tell() == 0:
+            dst.write(block(b''))
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def _read_varint(buf: bytes, pos: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def xz_streams(data: bytes | mmap.mmap) -> list[XzStream]:
+    """Block index of a .xz file, read from each stream's footer and index.
+
+    Raises ValueError if the footers do not parse.
+    """
+    streams = []
+    end = len(data)
+    while end > 0:
+        while end >= 4 and data[end - 4:end] == b'\0\0\0\0':
+            end -= 4
+        if end == 0:
+            break
+        footer = data[end - _HEADER_SIZE:end]
+        if len(footer) != _HEADER_SIZE or footer[10:] != _FOOTER_MAGIC:
+            raise ValueError('Not an .xz stream footer')
+        index_size = (int.from_bytes(footer[4:8], 'little') + 1) * 4
+        index_start = end - _HEADER_SIZE - index_size
+        index = data[index_start:index_start + index_size]
+        if not index or index[0] != 0:
+            raise ValueError('Not an .xz stream index')
+        records, pos = _read_varint(index, 1)
+        blocks = uncompressed = 0
+        for _ in range(records):
+            unpadded, pos = _read_varint(index, pos)
+            size, pos = _read_varint(index, pos)
+            blocks += (unpadded + 3) // 4 * 4
+            uncompressed += size
+        start = index_start - blocks - _HEADER_SIZE
+        if start < 0:
+            raise ValueError('Truncated .xz stream')
+        streams.append(XzStream(start, end - start, uncompressed))
+        end = start
+    return streams[::-1]
+
+
+def iter_decompressed(path: str | Path,
+                      workers: int | None = None) -> Iterator[bytes]:
+    """Inflate a .xz file in order, one stream per thread.
+
+    At most ``workers`` streams are inflated ahead of the consumer, so
+    memory stays near workers * block_size. Single-stream files,
+    including every archive written before block compression, decode
+    incrementally in chunks of at most BLOCK_SIZE.
+    """
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0,
+                                          access=mmap.ACCESS_READ) as data:
+        try:
+            streams = xz_streams(data)
+        except ValueError:
+            # Unparsed footers: let lzma find the stream boundaries.
+            yield lzma.decompress(data)
+            return
+        if len(streams) < 2:
+            decompressor = lzma.LZMADecompressor()
+            pos = 0
+            while not decompressor.eof:
+                chunk = b''
+                if decompressor.needs_input:
+                    chunk = data[pos:pos + BLOCK_SIZE]
+                    pos += len(chunk)
+                    if not chunk:
+                        raise EOFError('Compressed file ended before the '
+                                       'end-of-stream marker was reached')
+                if out := decompressor.decompress(chunk, BLOCK_SIZE):
+                    yield out
+            return
+
+        def inflate(stream: XzStream) -> bytes:
+            return lzma.decompress(data[stream.offset:
+                                        stream.offset + stream.length])
+
+        workers = _workers(workers)
+        with ThreadPoolExecutor(workers) as pool:
+            pending: deque = deque()
+            for stream in streams:
+                pending.append(pool.submit(inflate, stream))
+                if len(pending) >= workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
 
-    with path.open('rb') as src, lzma.open(out_path, 'wb', preset=9) as dst:
-        shutil.copyfileobj(src, dst)
-        return out_path
 
 def decompress(path: str | Path) -> Path:
     path = Path(path)
@@ -30,8 +156,9 @@ def decompress(path: str | Path) -> Path:
         raise ValueError(f'File does not end with .xz {path}')
 
     out_path = path.with_suffix('')
-
-    with lzma.open(path, 'rb') as src, out_path.open('wb') as dst:
-        shutil.copyfileobj(src,dst)
-
-    return out_path
\ No newline at end of file
+    tmp_path = out_path.with_suffix(out_path.suffix + '.tmp')
+    with tmp_path.open('wb') as out:
+        for chunk in iter_decompressed(path):
+            out.write(chunk)
+    os.replace(tmp_path, out_path)
+    return out_path
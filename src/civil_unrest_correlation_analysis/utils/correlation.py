@@ -0,0 +1,220 @@
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+
+from civil_unrest_correlation_analysis.utils.cleaning import BASE_COLUMNS
+from civil_unrest_correlation_analysis.utils.index import month_key_expr
+from civil_unrest_correlation_analysis.utils.model import TARGET
+from civil_unrest_correlation_analysis.utils.store import STORE_DIR
+
+MAX_LAG = 24
+MIN_PAIRS = 3
+METHODS = ['pearson', 'spearman']
+CORRELATION_SCHEMA = {
+    'method': pl.String,
+    'iso': pl.String,
+    'feature': pl.String,
+    'lag': pl.Int32,
+    'n': pl.Int32,
+    'r': pl.Float64,
+}
+
+
+@dataclass(frozen=True)
+class Panel:
+    """Dense grid with months last; gaps and missing months are NaN.
+
+    ``target`` is (country, month) and ``values`` (country, feature,
+    month), so every reduction and sort runs over contiguous memory.
+    """
+    isos: list[str]
+    features: list[str]
+    target: np.ndarray
+    values: np.ndarray
+
+
+def build_panel(data: pl.DataFrame) -> Panel:
+    features = [c for c in data.columns if c not in BASE_COLUMNS]
+    months = data.select(month_key_expr()).to_series().to_numpy()
+    isos, country = np.unique(data['iso'].to_numpy(), return_inverse=True)
+    month = months - months.min()
+    n_months = int(month.max()) + 1 if len(month) else 0
+    target = np.full((len(isos), n_months), np.nan)
+    target[country, month] = data[TARGET].cast(pl.Float64).to_numpy()
+    values = np.full((len(isos), len(features), n_months), np.nan)
+    values[country, :, month] = data.select(
+        pl.col(features).cast(pl.Float64)
+    ).to_numpy()
+    return Panel(isos=[str(iso) for iso in isos],
+                 features=features,
+                 target=target,
+                 values=values)
+
+
+@dataclass(frozen=True)
+class SortedRuns:
+    """Sort order of an array along its last axis and its runs of ties."""
+    order: np.ndarray
+    starts: np.ndarray
+    ends: np.ndarray
+
+
+def sort_runs(a: np.ndarray) -> SortedRuns:
+    order = np.argsort(a, axis=-1)
+    ordered = np.take_along_axis(a, order, axis=-1)
+    starts = np.ones(a.shape, dtype=bool)
+    starts[..., 1:] = ordered[..., 1:] != ordered[..., :-1]
+    ends = np.ones(a.shape, dtype=bool)
+    ends[..., :-1] = starts[..., 1:]
+    return SortedRuns(order=order, starts=starts, ends=ends)
+
+
+def masked_rank(runs: SortedRuns, valid: np.ndarray) -> np.ndarray:
+    """Average ranks of the ``valid`` entries among themselves; NaN elsewhere.
+
+    Ranks are counted over a sort done once, so a new mask (one per lag)
+    costs a few cumulative passes instead of another argsort.
+    """
+    order = np.broadcast_to(runs.order, valid.shape)
+    ordered = np.take_along_axis(valid, order, axis=-1)
+    counted = ordered.cumsum(axis=-1)
+    # Valid entries before each run and up to its end bound its ranks.
+    before = np.where(runs.starts, counted - ordered, 0)
+    before = np.maximum.accumulate(before, axis=-1)
+    through = np.where(runs.ends, counted, np.iinfo(counted.dtype).max)
+    through = np.minimum.accumulate(through[..., ::-1], axis=-1)[..., ::-1]
+    ranks = np.empty(valid.shape)
+    np.put_along_axis(ranks, order, (before + through + 1) / 2, axis=-1)
+    ranks[~valid] = np.nan
+    return ranks
+
+
+def pairwise_pearson(x: np.ndarray,
+                     y: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Correlation along the last axis, dropping pairs with a NaN side.
+
+    Returns (r, n); r is NaN below MIN_PAIRS or for constant series.
+    """
+    valid = ~(np.isnan(x) | np.isnan(y))
+    n = valid.sum(axis=-1)
+    x = np.where(valid, x, 0.0)
+    y = np.where(valid, y, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Centring first keeps large indicator levels from cancelling.
+        dx = np.where(valid, x - (x.sum(axis=-1) / n)[..., None], 0.0)
+        dy = np.where(valid, y - (y.sum(axis=-1) / n)[..., None], 0.0)
+        r = (dx * dy).sum(axis=-1) / np.sqrt(
+            (dx * dx).sum(axis=-1) * (dy * dy).sum(axis=-1)
+        )
+    r = np.where(n >= MIN_PAIRS, np.clip(r, -1.0, 1.0), np.nan)
+    return r, n
+
+
+def lag_masks(panel: Panel, lag: int) -> tuple[np.ndarray, np.ndarray]:
+    """Full-length masks of the pairs used at ``lag``, one per side.
+
+    Features at month t - lag are paired with the target at month t, and
+    a pair counts only when both sides are present.
+    """
+    window = panel.target.shape[1] - lag
+    both = ~(np.isnan(panel.values[..., :window])
+             | np.isnan(panel.target[:, None, lag:]))
+    feature_valid = np.zeros(panel.values.shape, dtype=bool)
+    feature_valid[..., :window] = both
+    target_valid = np.zeros(panel.values.shape, dtype=bool)
+    target_valid[..., lag:] = both
+    return feature_valid, target_valid
+
+
+def _pooled(a: np.ndarray) -> np.ndarray:
+    """(country, feature, month) to (feature, country * month)."""
+    return a.transpose(1, 0, 2).reshape(a.shape[1], -1)
+
+
+def _unpooled(a: np.ndarray, shape: tuple[int, ...]) -> np.ndarray:
+    return a.reshape(shape[1], shape[0], shape[2]).transpose(1, 0, 2)
+
+
+def _frame(method: str,
+           isos: list[str | None],
+           features: list[str],
+           lag: int,
+           r: np.ndarray,
+           n: np.ndarray) -> pl.DataFrame:
+    return pl.DataFrame({
+        'method': method,
+        'iso': np.repeat(np.array(isos, dtype=object), len(features)),
+        'feature': np.tile(features, len(isos)),
+        'lag': lag,
+        'n': n.ravel(),
+        'r': r.ravel(),
+    }, schema=CORRELATION_SCHEMA)
+
+
+def build_correlation_table(data: pl.DataFrame,
+                            max_lag: int = MAX_LAG) -> pl.DataFrame:
+    """Every method x country (and pooled, iso null) x feature x lag.
+
+    Each lag is one batched pass over the whole panel.
+    """
+    panel = build_panel(data)
+    shape = panel.values.shape
+    target = np.broadcast_to(panel.target[:, None, :], shape)
+    # Sorting once up front; each lag only changes which pairs are ranked.
+    feature_runs = sort_runs(panel.values)
+    target_runs = sort_runs(panel.target[:, None, :])
+    pooled_feature_runs = sort_runs(_pooled(panel.values))
+    pooled_target_runs = sort_runs(_pooled(panel.target[:, None, :]))
+    frames = []
+    for lag in range(min(max_lag, shape[2] - 1) + 1):
+        feature_valid, target_valid = lag_masks(panel, lag)
+        window = shape[2] - lag
+
+        def lagged(x: np.ndarray, y: np.ndarray) -> tuple[np.ndarray, ...]:
+            x, y = x[..., :window], y[..., lag:]
+            return x, y, _pooled(x), _pooled(y)
+
+        pooled_ranks = lagged(
+            _unpooled(masked_rank(pooled_feature_runs,
+                                  _pooled(feature_valid)), shape),
+            _unpooled(masked_rank(pooled_target_runs,
+                                  _pooled(target_valid)), shape),
+        )
+        inputs = {
+            'pearson': lagged(panel.values, target),
+            'spearman': lagged(
+                masked_rank(feature_runs, feature_valid),
+                masked_rank(target_runs, target_valid),
+            )[:2] + pooled_ranks[2:],
+        }
+        for method in METHODS:
+            x, y, pooled_x, pooled_y = inputs[method]
+            r, n = pairwise_pearson(x, y)
+            frames.append(_frame(method, panel.isos, panel.features,
+                                 lag, r, n))
+            r, n = pairwise_pearson(pooled_x, pooled_y)
+            frames.append(_frame(method, [None], panel.features, lag, r, n))
+    if not frames:
+        return pl.DataFrame(schema=CORRELATION_SCHEMA)
+    # Undefined correlations become null so the table serializes to JSON.
+    return pl.concat(frames).with_columns(pl.col('r').fill_nan(None)).sort(
+        ['method', 'iso', 'feature', 'lag'], nulls_last=False
+    )
+
+
+def load_correlation_table(data: pl.DataFrame,
+                           data_version: str,
+                           max_lag: int = MAX_LAG,
+                           store_dir: str | Path = STORE_DIR) -> pl.DataFrame:
+    path = Path(store_dir) / f'correlations-{data_version}-{max_lag}.arrow'
+    if path.exists():
+        return pl.read_ipc(path, memory_map=True)
+    table = build_correlation_table(data, max_lag)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+    table.write_ipc(tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+    return table
@@ -0,0 +1,130 @@
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import polars as pl
+
+from civil_unrest_correlation_analysis.utils.geometry import (
+    CountryGeometry,
+    GeometryCache,
+    assign_regions,
+)
+from civil_unrest_correlation_analysis.utils.index import (
+    PartitionIndex,
+    month_key,
+)
+
+
+@dataclass(frozen=True)
+class RegionCube:
+    """Cumulative monthly counts per (event_type, region) for one country.
+
+    ``counts[i]`` holds totals for every month before ``first_month + i``,
+    so a range total is ``counts[hi] - counts[lo]``.
+    """
+    first_month: int
+    names: np.ndarray
+    event_types: np.ndarray
+    counts: np.ndarray
+    fatalities: np.ndarray
+
+    @property
+    def n_months(self) -> int:
+        return self.counts.shape[0] - 1
+
+
+def build_region_cube(geometry: CountryGeometry,
+                      events: pl.DataFrame,
+                      months: np.ndarray) -> RegionCube:
+    names, name_idx = np.unique(geometry.names.astype(str),
+                                return_inverse=True)
+    event_types, type_idx = np.unique(
+        events['event_type'].fill_null('').to_numpy().astype(str),
+        return_inverse=True,
+    )
+    fatalities = events['fatalities'].fill_null(0).to_numpy()
+    first_month = int(months[0]) if len(months) else 0
+    n_months = int(months[-1]) - first_month + 1 if len(months) else 0
+    shape = (n_months, len(event_types), len(names))
+
+    point_idx, region_idx = assign_regions(
+        geometry,
+        events['longitude'].to_numpy(),
+        events['latitude'].to_numpy(),
+    )
+    flat = np.ravel_multi_index(
+        (months[point_idx] - first_month,
+         type_idx[point_idx],
+         name_idx[region_idx]),
+        shape,
+    )
+    size = int(np.prod(shape))
+    counts = np.zeros((n_months + 1, *shape[1:]), dtype=np.int64)
+    np.cumsum(np.bincount(flat, minlength=size).reshape(shape),
+              axis=0, out=counts[1:])
+    fatality_counts = np.zeros_like(counts)
+    np.cumsum(
+        np.bincount(flat, weights=fatalities[point_idx], minlength=size)
+        .astype(np.int64).reshape(shape),
+        axis=0, out=fatality_counts[1:],
+    )
+    return RegionCube(first_month=first_month,
+                      names=names,
+                      event_types=event_types,
+                      counts=counts,
+                      fatalities=fatality_counts)
+
+
+def region_counts(cube: RegionCube,
+                  start: str,
+                  end: str,
+                  event_type: str | None = None) -> pl.DataFrame:
+    lo = min(max(month_key(start) - cube.first_month, 0), cube.n_months)
+    hi = min(max(month_key(end) - cube.first_month + 1, lo), cube.n_months)
+    counts = cube.counts[hi] - cube.counts[lo]
+    fatalities = cube.fatalities[hi] - cube.fatalities[lo]
+    if event_type is None:
+        counts, fatalities = counts.sum(axis=0), fatalities.sum(axis=0)
+    else:
+        matches = np.flatnonzero(cube.event_types == event_type)
+        if len(matches) == 0:
+            counts = fatalities = np.zeros(len(cube.names), dtype=np.int64)
+        else:
+            counts, fatalities = counts[matches[0]], fatalities[matches[0]]
+    return pl.DataFrame({
+        'shapeName': cube.names,
+        'incident_count': counts,
+        'fatalities': fatalities,
+    }).filter(pl.col('incident_count') > 0)
+
+
+class CubeCache:
+    """Builds each country's RegionCube on first use and keeps it."""
+
+    def __init__(self, geometries: GeometryCache, index: PartitionIndex):
+        self._geometries = geometries
+        self._index = index
+        self._entries: dict[str, RegionCube] = {}
+        self._lock = threading.Lock()
+
+    def get(self, iso: str) -> RegionCube | None:
+        entry = self._entries.get(iso)
+        if entry is not None:
+            return entry
+        geometry = self._geometries.get(iso)
+        bounds = self._index.offsets.get(iso)
+        if geometry is None or bounds is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(iso)
+            if entry is None:
+                lo, hi = bounds
+                entry = build_region_cube(geometry,
+                                          self._index.df.slice(lo, hi - lo),
+                                          self._index.months[lo:hi])
+                self._entries[iso] = entry
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,69 @@
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import threading
+from collections.abc import Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, TypeVar
+
+T = TypeVar('T')
+
+
+class Overloaded(RuntimeError):
+    pass
+
+
+class StageExecutor:
+    """Runs blocking request stages off the event loop.
+
+    Threads take the polars/NumPy stages, which release the GIL. The
+    optional process pool takes GIL-bound geometry work; its workers read
+    inputs from the on-disk stores, so no datasets are pickled per call.
+    ``admit`` bounds the number of requests running or waiting.
+    """
+
+    def __init__(self, threads: int, processes: int, queue_depth: int):
+        self.queue_depth = queue_depth
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._threads = ThreadPoolExecutor(max_workers=threads,
+                                           thread_name_prefix='snapshot')
+        self._processes = None
+        if processes > 0:
+            # spawn, not fork: forking after polars has started its thread
+            # pool can deadlock the children.
+            self._processes = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+
+    @contextmanager
+    def admit(self) -> Iterator[None]:
+        with self._lock:
+            if self.in_flight >= self.queue_depth:
+                raise Overloaded(f'{self.in_flight} requests already queued')
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        loop = asyncio.get_running_loop()
+        call = functools.partial(contextvars.copy_context().run,
+                                 fn, *args, **kwargs)
+        return await loop.run_in_executor(self._threads, call)
+
+    def run_process(self, fn: Callable[..., T], *args: Any) -> T:
+        """Blocking; call from a thread stage, not from the event loop."""
+        if self._processes is None:
+            return fn(*args)
+        return self._processes.submit(fn, *args).result()
+
+    def shutdown(self) -> None:
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
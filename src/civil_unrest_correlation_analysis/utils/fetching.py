@@ -0,0 +1,194 @@
+import argparse
+import os
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date
+from pathlib import Path
+
+import polars as pl
+
+from civil_unrest_correlation_analysis.utils.store import (
+    ingest_csv,
+    scan_store,
+)
+
+ACLED_CACHE_DIR = 'data/acled_cache'
+DAY = 24 * 60 * 60
+
+Fetcher = Callable[[str, int], pl.DataFrame]
+
+
+def acled_year(iso: str, year: int) -> pl.DataFrame:
+    from geoacled import AcledYear
+
+    return AcledYear(iso=iso, year=str(year)).df
+
+
+class RateLimiter:
+    """Spaces calls at least ``1 / rate`` seconds apart across threads."""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+class AcledCache:
+    """Per-(iso, year) Parquet files; finished years stay fresh longer."""
+
+    def __init__(self,
+                 root: str | Path = ACLED_CACHE_DIR,
+                 current_max_age: float = DAY,
+                 past_max_age: float = 30 * DAY):
+        self.root = Path(root)
+        self.current_max_age = current_max_age
+        self.past_max_age = past_max_age
+
+    def path(self, iso: str, year: int) -> Path:
+        return self.root / iso / f'{year}.parquet'
+
+    def is_fresh(self, iso: str, year: int) -> bool:
+        path = self.path(iso, year)
+        if not path.exists():
+            return False
+        max_age = (self.current_max_age if year >= date.today().year
+                   else self.past_max_age)
+        return time.time() - path.stat().st_mtime < max_age
+
+    def put(self, iso: str, year: int, df: pl.DataFrame) -> Path:
+        # Empty years are cached too, so they are not refetched every run.
+        path = self.path(iso, year)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        df.write_parquet(tmp_path)
+        os.replace(tmp_path, path)
+        return path
+
+
+def fetch_with_retry(fetcher: Fetcher,
+                     iso: str,
+                     year: int,
+                     limiter: RateLimiter,
+                     retries: int,
+                     backoff: float) -> pl.DataFrame:
+    attempt = 0
+    while True:
+        limiter.acquire()
+        try:
+            return fetcher(iso, year)
+        except Exception:
+            if attempt >= retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+            attempt += 1
+
+
+def fetch_acled(isos: Iterable[str],
+                years: Iterable[int],
+                cache: AcledCache | None = None,
+                fetcher: Fetcher = acled_year,
+                workers: int = 8,
+                rate: float = 4.0,
+                retries: int = 3,
+                backoff: float = 1.0,
+                force: bool = False) -> tuple[pl.LazyFrame, dict[tuple, str]]:
+    """Fetch stale (iso, year) pairs concurrently into the cache.
+
+    Each result is written to disk as soon as it arrives, and the return
+    value is a lazy scan over the cached files, so no more than one
+    frame per worker is held in memory. Errors map (iso, year) to the
+    message; previously cached data for those pairs is still scanned.
+    """
+    cache = cache or AcledCache()
+    pairs = sorted({(iso, int(year)) for iso in isos for year in years})
+    todo = [pair for pair in pairs if force or not cache.is_fresh(*pair)]
+    limiter = RateLimiter(rate)
+    errors = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(fetch_with_retry, fetcher, iso, year,
+                        limiter, retries, backoff): (iso, year)
+            for iso, year in todo
+        }
+        for future in as_completed(futures):
+            pair = futures.pop(future)
+            try:
+                cache.put(*pair, future.result())
+            except Exception as e:
+                errors[pair] = str(e)
+
+    frames = [pl.scan_parquet(cache.path(*pair)) for pair in pairs
+              if cache.path(*pair).exists()]
+    frames = [lf for lf in frames if lf.collect_schema().len() > 0]
+    if not frames:
+        return pl.LazyFrame(), errors
+    return pl.concat(frames, how='diagonal_relaxed'), errors
+
+
+def oecd_isos_years(oecd_csv: str) -> tuple[list[str], list[int]]:
+    import pycountry
+
+    periods = (scan_store(oecd_csv)
+               .select('REF_AREA', 'TIME_PERIOD')
+               .unique()
+               .collect())
+    isos = []
+    for alpha_3 in periods['REF_AREA'].unique().to_list():
+        country = pycountry.countries.get(alpha_3=alpha_3)
+        if country is not None:
+            isos.append(str(country.numeric))
+    years = (periods['TIME_PERIOD'].str.slice(0, 4).cast(pl.Int32)
+             .unique().to_list())
+    return sorted(isos), sorted(years)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description='Fetch ACLED events per (iso, year) into the cache.'
+    )
+    parser.add_argument('--iso', nargs='*',
+                        help='Numeric ISO codes; defaults to the OECD isos')
+    parser.add_argument('--year', nargs='*', type=int,
+                        help='Years; defaults to the OECD periods')
+    parser.add_argument('--oecd-csv', default='data/final/oecd.csv')
+    parser.add_argument('--out', default='data/final/acled.csv')
+    parser.add_argument('--cache-dir', default=ACLED_CACHE_DIR)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=4.0,
+                        help='Maximum requests per second')
+    parser.add_argument('--retries', type=int, default=3)
+    parser.add_argument('--force', action='store_true')
+    args = parser.parse_args(argv)
+
+    isos, years = args.iso, args.year
+    if not isos or not years:
+        oecd_isos, oecd_years = oecd_isos_years(args.oecd_csv)
+        isos, years = isos or oecd_isos, years or oecd_years
+    events, errors = fetch_acled(isos,
+                                 years,
+                                 cache=AcledCache(args.cache_dir),
+                                 workers=args.workers,
+                                 rate=args.rate,
+                                 retries=args.retries,
+                                 force=args.force)
+    for (iso, year), error in sorted(errors.items()):
+        print(f'{iso} {year}: {error}')
+    # Streams from the cached Parquet files straight into the CSV.
+    events.sink_csv(args.out)
+    print(f'{args.out} -> {ingest_csv(args.out)}')
+    if errors:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+import fcntl
+import json
+import os
+import shutil
+import tempfile
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+import polars as pl
+
+if TYPE_CHECKING:
+    from sklearn.pipeline import Pipeline
+
+_SIGN = np.int64(-2**63)
+_ABS = np.int64(2**63 - 1)
+PREDICT_BATCH_ROWS = 64 * 1024
+
+
+@dataclass(frozen=True)
+class CompiledForest:
+    """A fitted impute -> scale -> random forest pipeline as flat arrays.
+
+    Trees are concatenated into global node arrays; ``roots`` holds each
+    tree's first node and leaves point to themselves. Thresholds are in
+    raw feature units, with ``nan_left`` giving the branch the imputed
+    mean would have taken.
+    """
+    feature_names: tuple[str, ...]
+    roots: np.ndarray
+    left: np.ndarray
+    right: np.ndarray
+    feature: np.ndarray
+    threshold: np.ndarray
+    nan_left: np.ndarray
+    value: np.ndarray
+    max_depth: int
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def predict(self, X: pl.DataFrame | np.ndarray,  # noqa: N803
+                batch_rows: int = PREDICT_BATCH_ROWS) -> np.ndarray:
+        """Predict in row batches so temporaries stay n_trees x batch_rows."""
+        if isinstance(X, pl.DataFrame):
+            X = X.select(self.feature_names).to_numpy()  # noqa: N806
+        X = np.asarray(X, dtype=np.float64)  # noqa: N806
+        if len(X) <= batch_rows:
+            return self._predict_batch(X)
+        return np.concatenate([self._predict_batch(X[start:start + batch_rows])
+                               for start in range(0, len(X), batch_rows)])
+
+    def _predict_batch(self, X: np.ndarray) -> np.ndarray:  # noqa: N803
+        rows = np.arange(len(X))
+        node = np.repeat(self.roots[:, None], len(X), axis=1)
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[node]]
+            go_left = np.where(np.isnan(x),
+                               self.nan_left[node],
+                               x <= self.threshold[node])
+            node = np.where(go_left, self.left[node], self.right[node])
+        # Sum tree by tree, as RandomForestRegressor does, so results match
+        # bit for bit rather than to within rounding.
+        total = np.zeros(len(X), dtype=np.float64)
+        for leaf_values in self.value[node]:
+            total += leaf_values
+        return total / self.n_trees
+
+
+def _to_ordered(x: np.ndarray) -> np.ndarray:
+    bits = x.view(np.int64)
+    return np.where(bits < 0, -(bits & _ABS), bits)
+
+
+def _from_ordered(key: np.ndarray) -> np.ndarray:
+    return np.where(key < 0, (-key) | _SIGN, key).view(np.float64)
+
+
+def _raw_thresholds(mean: np.ndarray,
+                    scale: np.ndarray,
+                    threshold: np.ndarray) -> np.ndarray:
+    """Largest raw x with float32((x - mean) / scale) <= threshold.
+
+    The scaled, float32-cast value is monotone in x, so a bisection over
+    the ordered float64 bit patterns finds the exact cut point.
+    """
+    lo = _to_ordered(np.full(len(threshold), -np.inf))
+    hi = _to_ordered(np.full(len(threshold), np.inf))
+    with np.errstate(over='ignore', invalid='ignore'):
+        while np.any(lo + 1 < hi):
+            mid = (lo >> 1) + (hi >> 1) + (lo & hi & 1)
+            x = _from_ordered(mid)
+            scaled = ((x - mean) / scale).astype(np.float32)
+            below = scaled.astype(np.float64) <= threshold
+            lo = np.where(below, mid, lo)
+            hi = np.where(below, hi, mid)
+    return _from_ordered(lo)
+
+
+def compile_pipeline(pipe: 'Pipeline') -> CompiledForest:
+    impute = pipe.named_steps['impute']
+    scale = pipe.named_steps['scale']
+    model = pipe.named_steps['model']
+    # The imputer drops all-NaN training columns, so step outputs index a
+    # subset of the raw features.
+    kept = np.flatnonzero(~np.isnan(impute.statistics_))
+    fill = impute.statistics_[kept]
+    mean = scale.mean_ if scale.mean_ is not None else np.zeros(len(kept))
+    std = scale.scale_ if scale.scale_ is not None else np.ones(len(kept))
+
+    roots, lefts, rights, features, thresholds, values = [], [], [], [], [], []
+    max_depth, offset = 0, 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        nodes = np.arange(tree.node_count)
+        leaf = tree.children_left < 0
+        roots.append(offset)
+        lefts.append(np.where(leaf, nodes, tree.children_left) + offset)
+        rights.append(np.where(leaf, nodes, tree.children_right) + offset)
+        features.append(np.where(leaf, 0, tree.feature))
+        thresholds.append(np.where(leaf, 0.0, tree.threshold))
+        values.append(tree.value[:, 0, 0])
+        max_depth = max(max_depth, tree.max_depth)
+        offset += tree.node_count
+
+    feature = np.concatenate(features)
+    threshold = np.concatenate(thresholds)
+    with np.errstate(over='ignore'):
+        filled = ((fill[feature] - mean[feature]) / std[feature])
+        nan_left = (filled.astype(np.float32).astype(np.float64)
+                    <= threshold)
+    return CompiledForest(
+        feature_names=tuple(pipe.feature_names_in_),
+        roots=np.asarray(roots, dtype=np.int32),
+        left=np.concatenate(lefts).astype(np.int32),
+        right=np.concatenate(rights).astype(np.int32),
+        feature=kept[feature].astype(np.int32),
+        threshold=_raw_thresholds(mean[feature], std[feature], threshold),
+        nan_left=nan_left,
+        value=np.concatenate(values),
+        max_depth=max_depth,
+    )
+
+
+_ARRAYS = [f.name for f in fields(CompiledForest)
+           if f.name not in ('feature_names', 'max_depth')]
+
+
+@contextmanager
+def forest_lock(path: str | Path) -> Iterator[None]:
+    """Exclusive lock so only one worker publishes a given forest."""
+    path = Path(path)
+    lock_path = path.with_name(path.name + '.lock')
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with lock_path.open('w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _write_tmp(forest: CompiledForest, path: Path) -> Path:
+    """One .npy per array, in a temp directory private to this process."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(dir=path.parent,
+                                    prefix=f'{path.name}.',
+                                    suffix='.tmp'))
+    try:
+        for name in _ARRAYS:
+            np.save(tmp_dir / f'{name}.npy', getattr(forest, name))
+        (tmp_dir / 'forest.json').write_text(json.dumps({
+            'feature_names': list(forest.feature_names),
+            'max_depth': forest.max_depth,
+        }))
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return tmp_dir
+
+
+def _publish(tmp_dir: Path, path: Path) -> None:
+    """Swap ``tmp_dir`` in; call with the forest lock held."""
+    old_dir = None
+    if path.exists():
+        # Renamed aside, never deleted in place, so readers that mapped
+        # the old arrays keep them.
+        old_dir = path.with_name(f'{path.name}.{os.getpid()}.old')
+        os.replace(path, old_dir)
+    os.replace(tmp_dir, path)
+    if old_dir is not None:
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def save_forest(forest: CompiledForest, path: str | Path) -> Path:
+    """Write one .npy per array so loads can memory-map them."""
+    path = Path(path)
+    tmp_dir = _write_tmp(forest, path)
+    with forest_lock(path):
+        _publish(tmp_dir, path)
+    return path
+
+
+def export_forest(path: str | Path,
+                  build: Callable[[], CompiledForest]) -> Path:
+    """Save ``build()`` at ``path`` unless some worker already has.
+
+    Workers starting together wait on the lock; only the first builds.
+    """
+    path = Path(path)
+    if path.exists():
+        return path
+    with forest_lock(path):
+        if not path.exists():
+            _publish(_write_tmp(build(), path), path)
+    return path
+
+
+def load_forest(path: str | Path) -> CompiledForest:
+    path = Path(path)
+    meta = json.loads((path / 'forest.json').read_text())
+    arrays = {name: np.load(path / f'{name}.npy', mmap_mode='r')
+              for name in _ARRAYS}
+    return CompiledForest(feature_names=tuple(meta['feature_names']),
+                          max_depth=meta['max_depth'],
+                          **arrays)
@@ -0,0 +1,69 @@
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+import shapely
+from shapely.strtree import STRtree
+
+if TYPE_CHECKING:
+    import geopandas as gpd
+
+CRS = 'EPSG:4326'
+
+
+@dataclass(frozen=True)
+class CountryGeometry:
+    geo_df: 'gpd.GeoDataFrame'
+    tree: STRtree
+    names: np.ndarray
+
+
+def build_country_geometry(geojson: dict[str, Any]) -> CountryGeometry:
+    # Pulls in geopandas; deferred so importing the server stays fast.
+    from geoacled.geojson import build_geo_df
+
+    geo_df = build_geo_df(geojson).to_crs(CRS)
+    return CountryGeometry(
+        geo_df=geo_df,
+        tree=STRtree(geo_df.geometry.values),
+        names=geo_df['shapeName'].to_numpy(),
+    )
+
+
+class GeometryCache:
+    """Lazily projected and indexed ADM1 geometry, one entry per iso."""
+
+    def __init__(self, loader: Callable[[str], dict[str, Any] | None]):
+        self._loader = loader
+        self._entries: dict[str, CountryGeometry] = {}
+        self._lock = threading.Lock()
+
+    def get(self, iso: str) -> CountryGeometry | None:
+        entry = self._entries.get(iso)
+        if entry is not None:
+            return entry
+        with self._lock:
+            entry = self._entries.get(iso)
+            if entry is None:
+                geojson = self._loader(iso)
+                if geojson is None:
+                    return None
+                entry = build_country_geometry(geojson)
+                self._entries[iso] = entry
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def assign_regions(geometry: CountryGeometry,
+                   lon: np.ndarray,
+                   lat: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Return (point_index, region_index) pairs for points within regions."""
+    points = shapely.points(lon, lat)
+    point_idx, region_idx = geometry.tree.query(points, predicate='within')
+    return point_idx, region_idx
+
@@ -0,0 +1,179 @@
+import argparse
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+import polars as pl
+
+from civil_unrest_correlation_analysis.utils.cleaning import (
+    ACLED_COLUMNS,
+    BASE_COLUMNS,
+    acled_incidents,
+    join_features,
+    pivot_oecd,
+    scan_acled,
+    scan_oecd_observations,
+)
+from civil_unrest_correlation_analysis.utils.compression import compress
+from civil_unrest_correlation_analysis.utils.store import (
+    STORE_DIR,
+    write_store,
+)
+
+FEATURES_DIR = f'{STORE_DIR}/features'
+MANIFEST_VERSION = 1
+
+
+def partition_fingerprints(lf: pl.LazyFrame) -> dict[str, str]:
+    """Order-independent hash of the rows in each (iso, year_month)."""
+    parts = (
+        lf.with_columns(pl.struct(pl.all()).hash(0).alias('_row_hash'))
+        .group_by(['iso', 'year_month'])
+        .agg(pl.col('_row_hash').sum())
+        .collect()
+    )
+    return {
+        f'{iso}/{year_month}': str(digest)
+        for iso, year_month, digest in parts.iter_rows()
+    }
+
+
+def changed_months(old: dict[str, str], new: dict[str, str]) -> set[str]:
+    keys = old.keys() ^ new.keys()
+    keys |= {key for key in old.keys() & new.keys() if old[key] != new[key]}
+    return {key.split('/', 1)[1] for key in keys}
+
+
+class FeatureTable:
+    """Feature rows stored as one Arrow file per month plus a manifest."""
+
+    def __init__(self, root: str | Path = FEATURES_DIR):
+        self.root = Path(root)
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.root / 'manifest.json'
+
+    def partition_path(self, year_month: str) -> Path:
+        return self.root / f'{year_month}.arrow'
+
+    def manifest(self) -> dict[str, Any]:
+        if self.manifest_path.exists():
+            manifest = json.loads(self.manifest_path.read_text())
+            if manifest.get('version') == MANIFEST_VERSION:
+                return manifest
+        return {'version': MANIFEST_VERSION, 'polars': pl.__version__,
+                'sources': {}}
+
+    def write_manifest(self, manifest: dict[str, Any]) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(manifest, sort_keys=True))
+        os.replace(tmp_path, self.manifest_path)
+
+    def put(self, year_month: str, rows: pl.DataFrame) -> None:
+        path = self.partition_path(year_month)
+        if rows.is_empty():
+            path.unlink(missing_ok=True)
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.arrow.tmp')
+        rows.write_ipc(tmp_path, compression='uncompressed')
+        os.replace(tmp_path, path)
+
+    def collect(self) -> pl.DataFrame:
+        paths = sorted(self.root.glob('*.arrow'))
+        if not paths:
+            raise FileNotFoundError(f'No feature partitions in {self.root}')
+        data = pl.concat([pl.read_ipc(path, memory_map=True)
+                          for path in paths], how='diagonal_relaxed')
+        feature_cols = sorted(c for c in data.columns
+                              if c not in BASE_COLUMNS)
+        return data.select(BASE_COLUMNS + feature_cols).sort(
+            ['year_month', 'iso']
+        )
+
+
+def refresh_features(oecd_csv: str,
+                     acled_csv: str,
+                     table: FeatureTable) -> list[str]:
+    """Recompute only the months whose ACLED or OECD partitions changed."""
+    acled = scan_acled(acled_csv)
+    observations = scan_oecd_observations(oecd_csv)
+    fingerprints = {
+        'acled': partition_fingerprints(
+            acled.select(ACLED_COLUMNS + ['year_month'])
+        ),
+        'oecd': partition_fingerprints(
+            observations.rename({'TIME_PERIOD': 'year_month'})
+        ),
+    }
+    manifest = table.manifest()
+    if manifest.get('polars') != pl.__version__:
+        # Row hashes are only stable within one polars version.
+        manifest = {'version': MANIFEST_VERSION, 'polars': pl.__version__,
+                    'sources': {}}
+    months: set[str] = set()
+    for source, parts in fingerprints.items():
+        months |= changed_months(manifest['sources'].get(source, {}), parts)
+
+    if months:
+        month_list = sorted(months)
+        incidents = acled_incidents(
+            acled.filter(pl.col('year_month').is_in(month_list))
+        ).collect()
+        oecd = pivot_oecd(
+            observations.filter(pl.col('TIME_PERIOD').is_in(month_list))
+        )
+        rows = join_features(incidents, oecd)
+        partitions = rows.partition_by('year_month', as_dict=True)
+        for month in months:
+            table.put(month, partitions.get((month,), rows.clear()))
+
+    manifest['sources'] = fingerprints
+    table.write_manifest(manifest)
+    return sorted(months)
+
+
+def refresh_dataset(oecd_csv: str,
+                    acled_csv: str,
+                    data_csv: str,
+                    features_dir: str | Path = FEATURES_DIR,
+                    export_csv: bool = False) -> tuple[pl.DataFrame, list[str]]:
+    """Upsert changed months and republish the assembled dataset store.
+
+    The CSV export is optional since rewriting and recompressing it
+    dominates a refresh; the server reads the Arrow store.
+    """
+    months = refresh_features(oecd_csv, acled_csv, FeatureTable(features_dir))
+    data = FeatureTable(features_dir).collect()
+    if export_csv:
+        data.write_csv(data_csv)
+        compress(data_csv)
+    write_store(data, data_csv)
+    return data, months
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description='Refresh changed months of the feature table.'
+    )
+    parser.add_argument('--oecd-csv', default='data/final/oecd.csv')
+    parser.add_argument('--acled-csv', default='data/final/acled.csv')
+    parser.add_argument('--data-csv', default='data/final/data.csv')
+    parser.add_argument('--root', default=FEATURES_DIR)
+    parser.add_argument('--export-csv', action='store_true',
+                        help='Also rewrite the data CSV and its .xz')
+    args = parser.parse_args(argv)
+
+    data, months = refresh_dataset(args.oecd_csv,
+                                   args.acled_csv,
+                                   args.data_csv,
+                                   features_dir=args.root,
+                                   export_csv=args.export_csv)
+    print(f'{len(months)} months refreshed, {data.height} rows')
+
+
+if __name__ == '__main__':
+    main()
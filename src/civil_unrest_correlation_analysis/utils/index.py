@@ -0,0 +1,80 @@
+from dataclasses import dataclass
+
+import numpy as np
+import polars as pl
+
+
+@dataclass(frozen=True)
+class PartitionIndex:
+    """Frame sorted by (iso, year_month) with per-iso row offsets."""
+    df: pl.DataFrame
+    offsets: dict[str, tuple[int, int]]
+    months: np.ndarray
+
+
+def month_key(year_month: str) -> int:
+    """Months since year 0; raises ValueError outside 01-12."""
+    year, month = year_month.split('-')
+    if not 1 <= int(month) <= 12:
+        raise ValueError(f'Invalid month in {year_month!r}')
+    return int(year) * 12 + int(month) - 1
+
+
+def month_key_expr(col: str = 'year_month') -> pl.Expr:
+    return (pl.col(col).str.slice(0, 4).cast(pl.Int32) * 12
+            + pl.col(col).str.slice(5, 2).cast(pl.Int32) - 1)
+
+
+def month_keys(df: pl.DataFrame) -> np.ndarray:
+    if 'year_month' in df.columns:
+        return df.select(month_key_expr()).to_series().to_numpy()
+    date = pl.col('date')
+    return df.select(
+        date.dt.year().cast(pl.Int32) * 12 + date.dt.month().cast(pl.Int32) - 1
+    ).to_series().to_numpy()
+
+
+def build_partition_index(df: pl.DataFrame,
+                          presorted: bool = False) -> PartitionIndex:
+    """``presorted`` skips the sort, keeping memory-mapped frames mapped.
+
+    Months come from ``year_month`` or, in compact frames, ``date``.
+    """
+    if not presorted:
+        month_col = 'year_month' if 'year_month' in df.columns else 'date'
+        df = df.sort(['iso', month_col], maintain_order=True)
+    months = month_keys(df)
+    bounds = (
+        df.select('iso')
+        .with_row_index('start')
+        .group_by('iso', maintain_order=True)
+        .agg(pl.col('start').first(), pl.len())
+    )
+    offsets = {
+        row['iso']: (row['start'], row['start'] + row['len'])
+        for row in bounds.iter_rows(named=True)
+    }
+    return PartitionIndex(df=df, offsets=offsets, months=months)
+
+
+def slice_partition(index: PartitionIndex,
+                    iso: str,
+                    start: str,
+                    end: str) -> pl.DataFrame:
+    bounds = index.offsets.get(iso)
+    if bounds is None:
+        return index.df.clear()
+    lo, hi = bounds
+    keys = index.months[lo:hi]
+    first = lo + int(np.searchsorted(keys, month_key(start), side='left'))
+    last = lo + int(np.searchsorted(keys, month_key(end), side='right'))
+    return index.df.slice(first, max(last - first, 0))
+
+
+def slice_partitions(index: PartitionIndex,
+                     isos: list[str],
+                     start: str,
+                     end: str) -> pl.DataFrame:
+    """Several countries' rows as one frame, in request order."""
+    slices = [slice_partition(index, iso, start, end) for iso in isos]
+    return pl.concat(slices) if slices else index.df.clear()
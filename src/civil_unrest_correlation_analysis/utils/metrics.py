@@ -0,0 +1,243 @@
+import bisect
+import contextvars
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+import polars as pl
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = tuple[tuple[str, str], ...]
+
+_SPANS: contextvars.ContextVar[list[tuple[str, float]] | None] = (
+    contextvars.ContextVar('spans', default=None)
+)
+
+
+def _format_labels(labels: Labels, extra: str = '') -> str:
+    parts = [f'{key}="{_escape(value)}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _escape(value: str) -> str:
+    return (value.replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str,
+                 buckets: tuple[float, ...] = BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series: dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            if slot < len(self.buckets):
+                series[0][slot] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.help_text}',
+                 f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = {key: (list(b), s, c)
+                      for key, (b, s, c) in self._series.items()}
+        for labels, (bucket_counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                le = _format_labels(labels, f'le="{bound}"')
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            le = _format_labels(labels, 'le="+Inf"')
+            lines.append(f'{self.name}_bucket{le} {count}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {total}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {count}')
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.help_text}',
+                 f'# TYPE {self.name} gauge']
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.extend(f'{self.name}{_format_labels(labels)} {value}'
+                     for labels, value in values)
+        return lines
+
+
+STAGE_SECONDS = Histogram('snapshot_stage_seconds',
+                          'Time spent in each snapshot stage.')
+REQUEST_SECONDS = Histogram('http_request_duration_seconds',
+                            'Request latency by route and status.')
+LOAD_SECONDS = Gauge('lifespan_load_seconds',
+                     'Duration of each startup loading step.')
+FRAME_ROWS = Gauge('dataset_rows', 'Rows per loaded frame.')
+FRAME_BYTES = Gauge('dataset_bytes', 'Estimated in-memory size per frame.')
+RESIDENT_BYTES = Gauge('process_resident_memory_bytes',
+                       'Resident set size of this worker.')
+METRICS = [STAGE_SECONDS, REQUEST_SECONDS, LOAD_SECONDS,
+           FRAME_ROWS, FRAME_BYTES, RESIDENT_BYTES]
+
+
+@contextmanager
+def collect_spans() -> Iterator[list[tuple[str, float]]]:
+    """Gather the spans recorded by this request, including executor stages."""
+    spans: list[tuple[str, float]] = []
+    token = _SPANS.set(spans)
+    try:
+        yield spans
+    finally:
+        _SPANS.reset(token)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - started)
+
+
+def record_span(name: str, elapsed: float) -> None:
+    STAGE_SECONDS.observe(elapsed, stage=name)
+    spans = _SPANS.get()
+    if spans is not None:
+        spans.append((name, elapsed))
+
+
+def server_timing(spans: list[tuple[str, float]]) -> str:
+    totals: dict[str, float] = defaultdict(float)
+    for name, elapsed in spans:
+        totals[name] += elapsed
+    return ', '.join(f'{name};dur={elapsed * 1000:.2f}'
+                     for name, elapsed in totals.items())
+
+
+@contextmanager
+def timed_load(step: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        LOAD_SECONDS.set(time.perf_counter() - started, step=step)
+
+
+def record_frames(frames: dict[str, pl.DataFrame]) -> None:
+    FRAME_ROWS.clear()
+    FRAME_BYTES.clear()
+    for name, df in frames.items():
+        FRAME_ROWS.set(df.height, frame=name)
+        FRAME_BYTES.set(df.estimated_size(), frame=name)
+
+
+def _resident_bytes() -> int | None:
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+def render_metrics() -> str:
+    rss = _resident_bytes()
+    if rss is not None:
+        RESIDENT_BYTES.set(rss)
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+class SamplingProfiler:
+    """Samples one thread's stack at a fixed interval into folded stacks.
+
+    Output is in the collapsed format flamegraph tools read. Only the
+    profiled thread is touched, so other requests are unaffected.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({code.co_filename}:'
+                             f'{frame.f_lineno})')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def __enter__(self) -> 'SamplingProfiler':
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: str | Path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(''.join(f'{stack} {count}\n'
+                                for stack, count in self.samples.items()))
+        return path
+
+
+@contextmanager
+def profile_if_slow(name: str,
+                    threshold: float | None,
+                    profile_dir: str | Path,
+                    interval: float = 0.005) -> Iterator[None]:
+    """Profile the current thread; keep the capture only if it ran slow."""
+    if threshold is None:
+        yield
+        return
+    started = time.perf_counter()
+    with SamplingProfiler(threading.get_ident(), interval) as profiler:
+        yield
+    elapsed = time.perf_counter() - started
+    if elapsed >= threshold and profiler.samples:
+        stamp = time.strftime('%Y%m%dT%H%M%S')
+        profiler.write(Path(profile_dir)
+                       / f'{stamp}-{name}-{elapsed * 1000:.0f}ms.folded')
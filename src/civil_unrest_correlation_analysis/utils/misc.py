@@ -1,43 +1,55 @@
 
 
+from functools import cache
+
 import numpy as np
 import polars as pl
-import pycountry
-from geoacled import AcledYear
 
 
-def _get_numeric_iso(alpha_3:str) -> str | None:
-    norm = alpha_3.strip().strip('"').strip("'").upper()
-    country = pycountry.countries.get(alpha_3=norm)
-    if country:
-        return str(country.numeric)
-    return None
+@cache
+def alpha3_lookup() -> pl.DataFrame:
+    """alpha-3 to numeric ISO for every pycountry country, built once."""
+    import pycountry
+
+    return pl.DataFrame(
+        [(country.alpha_3, str(country.numeric))
+         for country in pycountry.countries],
+        schema={'alpha_3': pl.String, 'iso': pl.String},
+        orient='row',
+    )
+
+def join_numeric_iso(lf: pl.LazyFrame, col: str) -> pl.LazyFrame:
+    """Add numeric ISO ``iso`` for the alpha-3 codes in ``col``.
+
+    Codes are trimmed, unquoted and upper-cased, then joined against
+    ``alpha3_lookup``; unknown codes get a null ``iso``.
+    """
+    alpha_3 = (pl.col(col).str.strip_chars().str.strip_chars('"')
+               .str.strip_chars("'").str.to_uppercase())
+    return lf.with_columns(alpha_3.alias('_alpha_3')).join(
+        alpha3_lookup().lazy(),
+        left_on='_alpha_3',
+        right_on='alpha_3',
+        how='left',
+        maintain_order='left',
+    ).drop('_alpha_3')
 
 def numeric_iso_col(df: pl.DataFrame, col: 'str') -> pl.DataFrame:
-    return df.with_columns(pl.col(col)
-                         .map_elements(
-                             _get_numeric_iso, return_dtype=pl.String
-                             )
-                             .alias('iso'))
+    return join_numeric_iso(df.lazy(), col).collect()
 
 def year_month_col(df: pl.DataFrame, col: 'str') -> pl.DataFrame:
     return df.with_columns(pl.col(col).str.to_date().dt.strftime("%Y-%m")
     .alias('year_month'))
 
-def fetch_acled_for_countries(df:pl.DataFrame) -> pl.DataFrame:
-    isos = df['iso'].unique().to_list()
-    periods = df['TIME_PERIOD'].unique().to_list()
-    years = []
-    dfs = []
-    for period in periods:
-        years.append(period.split('-')[0])
-    years_set = set(years)
-    for iso in isos:
-        for year in years_set:
-            year_df = AcledYear(iso=iso, year=year).df
-            if year_df.width > 0 and year_df.height > 0:
-                dfs.append(year_df)
-    return pl.concat(dfs)
+def fetch_acled_for_countries(df: pl.DataFrame, **kwargs) -> pl.DataFrame:
+    # fetching pulls in geoacled, which the server never needs.
+    from civil_unrest_correlation_analysis.utils.fetching import fetch_acled
+
+    years = df['TIME_PERIOD'].str.slice(0, 4).cast(pl.Int32).unique().to_list()
+    events, errors = fetch_acled(df['iso'].unique().to_list(), years, **kwargs)
+    if errors:
+        raise RuntimeError(f'ACLED fetch failed for {sorted(errors)}')
+    return events.collect()
 
 
 def build_feature_df(pipe) -> pl.DataFrame | None:
@@ -1,51 +1,149 @@
+import hashlib
+import json
 import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
 
-import joblib
 import numpy as np
 import polars as pl
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.impute import SimpleImputer
-from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import StandardScaler
 
+from civil_unrest_correlation_analysis.utils.forest import (
+    CompiledForest,
+    compile_pipeline,
+    export_forest,
+    load_forest,
+    save_forest,
+)
+from civil_unrest_correlation_analysis.utils.store import STORE_DIR
 
-def build_pipeline(X_train: pl.DataFrame, # noqa: N803
-                   y_train: pl.Series,
-                   file: str) -> Pipeline:
-    pipe = Pipeline([
+# sklearn and joblib cost about a second to import; the server only
+# needs them when a compiled forest has to be exported.
+if TYPE_CHECKING:
+    from sklearn.pipeline import Pipeline
+
+
+MODEL_DIR = 'data/models'
+TARGET = 'incidents'
+ID_COLUMNS = ['iso', 'year_month']
+
+
+def split_features(data: pl.DataFrame) -> tuple[pl.DataFrame, pl.Series]:
+    return data.drop([*ID_COLUMNS, TARGET]), data[TARGET]
+
+
+def data_hash(data: pl.DataFrame) -> str:
+    """Content hash of the training frame, independent of its file format."""
+    canonical = data.sort(ID_COLUMNS, maintain_order=True).write_csv()
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+def build_pipeline(params: dict[str, Any] | None = None,
+                   n_jobs: int | None = None) -> 'Pipeline':
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    return Pipeline([
         ('impute', SimpleImputer(strategy='mean')),
         ('scale', StandardScaler()),
-        ('model', RandomForestRegressor()),
-    ])
-
-    pipe = pipe.fit(X_train, y_train)
-    save_pipeline(pipe, file)
-    return pipe
-
-
-def save_pipeline(pipeline: Pipeline, file: str):
-    metadata = {
-        'model_name': 'OECD/ACLED Random Forest Regression',
-        'version': '1.0',
-        'trained_date': '2025-12-08',
-        'algorithm': 'Random Forest Regressor',
-        'performance_metrics': {'r2_score': '.84'},
-        'training_data': {'size': '398',
-                          'description':
-                          'Random Forest Regression on OECD/ACLED data'},
-        'authors': 'Jacque Sheehan, Sean McLeaish',
-    }
-    joblib.dump({'pipeline': pipeline, 'metadata': metadata}, file)
-
-
-def import_pipeline(X_train: pl.DataFrame,  # noqa: N803
-                    y_train: pl.Series,
-                    file: str) -> Pipeline:
-    if os.path.exists(file):
-        loaded = joblib.load(file)
-        if isinstance(loaded, dict) and "pipeline" in loaded:
-            return loaded["pipeline"]
-    return build_pipeline(X_train, y_train, file)
+        ('model', RandomForestRegressor(random_state=42, n_jobs=n_jobs)),
+    ]).set_params(**(params or {}))
+
+
+class ModelRegistry:
+    """Fitted pipelines keyed by the hash of the data they were trained on."""
+
+    def __init__(self, root: str | Path = MODEL_DIR):
+        self.root = Path(root)
+
+    @property
+    def index_path(self) -> Path:
+        return self.root / 'registry.json'
+
+    def artifact_path(self, key: str) -> Path:
+        return self.root / f'random_forest-{key}.joblib'
+
+    def index(self) -> dict[str, dict[str, Any]]:
+        if not self.index_path.exists():
+            return {}
+        return json.loads(self.index_path.read_text())
+
+    def has(self, key: str) -> bool:
+        return key in self.index() and self.artifact_path(key).exists()
+
+    def forest_path(self, key: str) -> Path:
+        return self.root / f'random_forest-{key}.forest'
+
+    def load(self, key: str) -> 'Pipeline':
+        import joblib
+
+        path = self.artifact_path(key)
+        if key not in self.index() or not path.exists():
+            raise FileNotFoundError(
+                f'No model registered for training data {key} in {self.root};'
+                ' run python -m civil_unrest_correlation_analysis.utils.training'
+            )
+        return joblib.load(path)['pipeline']
+
+    def load_forest(self, key: str) -> CompiledForest:
+        """Compiled form of the registered pipeline, exported on first use."""
+        path = export_forest(self.forest_path(key),
+                             lambda: compile_pipeline(self.load(key)))
+        return load_forest(path)
+
+    def put(self, key: str,
+            pipeline: 'Pipeline',
+            metadata: dict[str, Any]) -> Path:
+        import joblib
+
+        path = self.artifact_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        joblib.dump({'pipeline': pipeline, 'metadata': metadata}, tmp_path)
+        os.replace(tmp_path, path)
+        save_forest(compile_pipeline(pipeline), self.forest_path(key))
+        index = self.index()
+        index[key] = metadata
+        tmp_index = self.index_path.with_suffix('.tmp')
+        tmp_index.write_text(json.dumps(index, indent=1, sort_keys=True))
+        os.replace(tmp_index, self.index_path)
+        return path
+
+
+def artifact_hash(file: str | Path) -> str:
+    digest = hashlib.sha256()
+    with open(file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def build_prediction_table(data: pl.DataFrame,
+                           forest: CompiledForest) -> pl.DataFrame:
+    y_pred = forest.predict(data)
+    return data.select(['iso', 'year_month', 'incidents']).with_columns(
+        pl.Series('predicted', y_pred)
+    )
+
+
+def load_prediction_table(data: pl.DataFrame,
+                          forest: CompiledForest,
+                          file: str | Path,
+                          data_version: str,
+                          store_dir: str | Path = STORE_DIR) -> pl.DataFrame:
+    path = Path(store_dir) / (
+        f'predictions-{artifact_hash(file)}-{data_version}.arrow'
+    )
+    if path.exists():
+        return pl.read_ipc(path, memory_map=True)
+    table = build_prediction_table(data, forest)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Workers starting together may all build it; each replaces atomically.
+    tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+    table.write_ipc(tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+    return table
 
 def build_feature_df(pipe) -> pl.DataFrame | None:
         model = pipe.named_steps['model']
@@ -0,0 +1,96 @@
+import fcntl
+import json
+import os
+import shutil
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+import polars as pl
+
+PRELOAD_DIR = 'data/store/preload'
+MANIFEST = 'manifest.json'
+MODEL_FILE = 'model.joblib'
+
+Loaded = tuple[dict[str, pl.DataFrame], Any]
+
+
+@contextmanager
+def preload_lock(preload_dir: str | Path) -> Iterator[None]:
+    """Exclusive lock so only one worker materializes the preload files."""
+    lock_path = Path(f'{preload_dir}.lock')
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with lock_path.open('w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def read_manifest(preload_dir: str | Path) -> dict[str, Any] | None:
+    path = Path(preload_dir) / MANIFEST
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def materialize(preload_dir: str | Path,
+                frames: dict[str, pl.DataFrame],
+                model: Any,
+                key: str) -> None:
+    preload_dir = Path(preload_dir)
+    tmp_dir = preload_dir.with_name(preload_dir.name + '.tmp')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    for name, df in frames.items():
+        # Uncompressed so every worker can map the same pages.
+        df.write_ipc(tmp_dir / f'{name}.arrow', compression='uncompressed')
+    import joblib
+
+    joblib.dump(model, tmp_dir / MODEL_FILE)
+    (tmp_dir / MANIFEST).write_text(
+        json.dumps({'key': key, 'frames': sorted(frames)})
+    )
+    shutil.rmtree(preload_dir, ignore_errors=True)
+    os.replace(tmp_dir, preload_dir)
+
+
+def attach(preload_dir: str | Path, key: str) -> Loaded | None:
+    manifest = read_manifest(preload_dir)
+    if manifest is None or manifest['key'] != key:
+        return None
+    preload_dir = Path(preload_dir)
+    frames = {
+        name: pl.read_ipc(preload_dir / f'{name}.arrow', memory_map=True)
+        for name in manifest['frames']
+    }
+    import joblib
+
+    model = joblib.load(preload_dir / MODEL_FILE, mmap_mode='r')
+    return frames, model
+
+
+def attach_or_build(preload_dir: str | Path,
+                    version: Callable[[], str],
+                    build: Callable[[], Loaded]) -> Loaded:
+    """Attach to preloaded files, building them first if they are stale.
+
+    ``version`` is evaluated again after ``build`` because building can
+    create the store or model files the key is derived from.
+    """
+    loaded = attach(preload_dir, version())
+    if loaded is not None:
+        return loaded
+    with preload_lock(preload_dir):
+        loaded = attach(preload_dir, version())
+        if loaded is not None:
+            return loaded
+        frames, model = build()
+        materialize(preload_dir, frames, model, version())
+        del frames, model
+        loaded = attach(preload_dir, version())
+    if loaded is None:
+        raise RuntimeError(f'Preload in {preload_dir} could not be attached')
+    return loaded
@@ -0,0 +1,194 @@
+import argparse
+import fcntl
+import os
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+import polars as pl
+
+from civil_unrest_correlation_analysis.utils.compression import (
+    iter_decompressed,
+)
+
+STORE_DIR = 'data/store'
+SCHEMA_OVERRIDES: dict[str, type[pl.DataType]] = {'iso': pl.String}
+
+
+def store_path(csv_path: str | Path,
+               store_dir: str | Path = STORE_DIR) -> Path:
+    name = Path(csv_path).name.removesuffix('.xz').removesuffix('.csv')
+    return Path(store_dir) / f'{name}.arrow'
+
+
+def _source_mtime(csv_path: str | Path) -> float | None:
+    mtimes = [os.path.getmtime(p)
+              for p in (str(csv_path), f'{csv_path}.xz')
+              if os.path.exists(p)]
+    return max(mtimes) if mtimes else None
+
+
+@contextmanager
+def store_lock(csv_path: str | Path,
+               store_dir: str | Path = STORE_DIR) -> Iterator[None]:
+    """Exclusive lock so only one worker ingests a given source."""
+    lock_path = store_path(csv_path, store_dir).with_suffix('.arrow.lock')
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with lock_path.open('w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def is_stale(csv_path: str | Path,
+             store_dir: str | Path = STORE_DIR) -> bool:
+    path = store_path(csv_path, store_dir)
+    if not path.exists():
+        return True
+    source_mtime = _source_mtime(csv_path)
+    return source_mtime is not None and source_mtime > path.stat().st_mtime
+
+
+def iter_csv_records(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Regroup raw chunks into pieces that end on a record boundary.
+
+    A newline ends a record only outside quotes, i.e. after an even
+    number of quote characters, since escaped quotes come in pairs.
+    """
+    carry = b''
+    for chunk in chunks:
+        buf = carry + chunk
+        end = buf.rfind(b'\n')
+        quotes = buf.count(b'"', 0, end) if end >= 0 else 0
+        while end >= 0 and quotes % 2:
+            previous = buf.rfind(b'\n', 0, end)
+            quotes -= buf.count(b'"', max(previous, 0), end)
+            end = previous
+        if end < 0:
+            carry = buf
+            continue
+        yield buf[:end + 1]
+        carry = buf[end + 1:]
+    if carry.strip():
+        yield carry
+
+
+def sink_csv_xz(compressed_path: str | Path,
+                out_path: str | Path,
+                schema_overrides: dict | None = None) -> None:
+    """Parse a .csv.xz piece by piece into an uncompressed IPC file.
+
+    The schema comes from the first piece, as read_csv infers it from
+    the first rows, so only one piece is in memory at a time.
+    """
+    import pyarrow.ipc
+
+    schema = None
+    writer = None
+    try:
+        for piece in iter_csv_records(iter_decompressed(compressed_path)):
+            if schema is None:
+                df = pl.read_csv(piece, schema_overrides=schema_overrides)
+                schema = df.schema
+            else:
+                df = pl.read_csv(piece, has_header=False, schema=schema)
+            table = df.to_arrow()
+            if writer is None:
+                writer = pyarrow.ipc.new_file(str(out_path), table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        raise pl.exceptions.NoDataError(f'Empty CSV {compressed_path}')
+
+
+def ingest_csv(csv_path: str | Path,
+               store_dir: str | Path = STORE_DIR,
+               schema_overrides: dict | None = None) -> Path:
+    out_path = store_path(csv_path, store_dir)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    schema_overrides = schema_overrides or SCHEMA_OVERRIDES
+    compressed_path = f'{csv_path}.xz'
+    # Per-process temp name; concurrent writers each replace atomically.
+    tmp_path = out_path.with_suffix(f'.{os.getpid()}.tmp')
+    try:
+        # Uncompressed IPC so readers can memory-map the buffers directly.
+        if os.path.exists(csv_path):
+            pl.scan_csv(csv_path, schema_overrides=schema_overrides).sink_ipc(
+                tmp_path, compression=None
+            )
+        elif os.path.exists(compressed_path):
+            # Streamed from the archive; no uncompressed copy is kept.
+            sink_csv_xz(compressed_path, tmp_path, schema_overrides)
+        else:
+            raise FileNotFoundError(
+                f'Missing both {csv_path} and {csv_path}.xz'
+            )
+        os.replace(tmp_path, out_path)
+    finally:
+        # Gone after a successful replace; left over only on failure.
+        tmp_path.unlink(missing_ok=True)
+    return out_path
+
+
+def write_store(df: pl.DataFrame,
+                csv_path: str | Path,
+                store_dir: str | Path = STORE_DIR) -> Path:
+    out_path = store_path(csv_path, store_dir)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_suffix(f'.{os.getpid()}.tmp')
+    try:
+        df.write_ipc(tmp_path, compression='uncompressed')
+        os.replace(tmp_path, out_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return out_path
+
+
+def write_mapped_column(series: pl.Series, path: str | Path) -> pl.Series:
+    """Persist one column and return it memory-mapped from disk.
+
+    Pages are only read in for the rows that are touched, so a large
+    text column costs no resident memory until it is returned.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Workers may write concurrently; each replaces atomically.
+    tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+    series.to_frame().write_ipc(tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+    return pl.read_ipc(path, memory_map=True).to_series()
+
+
+def scan_store(csv_path: str | Path,
+               store_dir: str | Path = STORE_DIR,
+               schema_overrides: dict | None = None) -> pl.LazyFrame:
+    if is_stale(csv_path, store_dir):
+        with store_lock(csv_path, store_dir):
+            # Another worker may have ingested it while this one waited.
+            if is_stale(csv_path, store_dir):
+                ingest_csv(csv_path, store_dir, schema_overrides)
+    return pl.scan_ipc(store_path(csv_path, store_dir), memory_map=True)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description='Ingest CSV (or .csv.xz) sources into the Arrow IPC store.'
+    )
+    parser.add_argument('csv', nargs='+', help='CSV paths, without .xz')
+    parser.add_argument('--store-dir', default=STORE_DIR)
+    parser.add_argument('--force', action='store_true',
+                        help='Re-ingest even when the store is up to date')
+    args = parser.parse_args(argv)
+    for csv_path in args.csv:
+        if args.force or is_stale(csv_path, args.store_dir):
+            print(f'{csv_path} -> {ingest_csv(csv_path, args.store_dir)}')
+        else:
+            print(f'{csv_path} is up to date')
+
+
+if __name__ == '__main__':
+    main()
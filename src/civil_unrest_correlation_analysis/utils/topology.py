@@ -0,0 +1,243 @@
+import json
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+import shapely
+from shapely.errors import GEOSException
+
+from civil_unrest_correlation_analysis.utils.boundaries import BoundaryStore
+from civil_unrest_correlation_analysis.utils.geometry import (
+    GeometryCache,
+    build_country_geometry,
+)
+
+if TYPE_CHECKING:
+    import geopandas as gpd
+
+
+@dataclass(frozen=True)
+class Lod:
+    tolerance: float
+    digits: int | None
+    quantization: int
+
+
+# Tolerances are in degrees (EPSG:4326); level 0 is full resolution.
+LODS: dict[int, Lod] = {
+    0: Lod(tolerance=0.0, digits=None, quantization=1_000_000),
+    1: Lod(tolerance=0.002, digits=4, quantization=100_000),
+    2: Lod(tolerance=0.01, digits=3, quantization=50_000),
+    3: Lod(tolerance=0.05, digits=2, quantization=10_000),
+}
+
+
+def simplify_geo_df(geo_df: 'gpd.GeoDataFrame',
+                    lod: Lod) -> 'gpd.GeoDataFrame':
+    import geopandas as gpd
+
+    geoms = np.asarray(geo_df.geometry.values)
+    if lod.tolerance > 0:
+        exterior_cw = _exterior_cw(geoms)
+        try:
+            # Simplifies shared borders once so neighbours stay gap-free.
+            geoms = shapely.coverage_simplify(geoms, lod.tolerance)
+        except GEOSException:
+            geoms = shapely.simplify(geoms, lod.tolerance,
+                                     preserve_topology=True)
+        geoms = shapely.orient_polygons(geoms, exterior_cw=exterior_cw)
+    if lod.digits is not None:
+        digits = lod.digits
+        geoms = shapely.transform(geoms, lambda c: np.round(c, digits))
+    return geo_df.set_geometry(
+        gpd.GeoSeries(geoms, index=geo_df.index, crs=geo_df.crs)
+    )
+
+
+def _exterior_cw(geoms: np.ndarray) -> bool:
+    for geom in geoms:
+        polygons = shapely.get_parts(geom)
+        if len(polygons):
+            return not polygons[0].exterior.is_ccw
+    return False
+
+
+def _polygon_rings(geom, origin: np.ndarray, scale: np.ndarray) -> list:
+    polygons = []
+    for polygon in shapely.get_parts(geom):
+        rings = []
+        for ring in (polygon.exterior, *polygon.interiors):
+            coords = np.round(
+                (shapely.get_coordinates(ring) - origin) / scale
+            ).astype(np.int64)
+            keep = np.ones(len(coords), dtype=bool)
+            keep[1:] = np.any(coords[1:] != coords[:-1], axis=1)
+            coords = coords[keep]
+            if len(coords) >= 4:
+                rings.append(coords)
+        if rings:
+            polygons.append(rings)
+    return polygons
+
+
+def _junctions(rings: list[np.ndarray], width: int) -> np.ndarray:
+    """Point keys where rings meet with different neighbours."""
+    rows = []
+    for ring in rings:
+        keys = ring[:-1, 0] * width + ring[:-1, 1]
+        prev_keys, next_keys = np.roll(keys, 1), np.roll(keys, -1)
+        rows.append(np.column_stack([keys,
+                                     np.minimum(prev_keys, next_keys),
+                                     np.maximum(prev_keys, next_keys)]))
+    if not rows:
+        return np.empty(0, dtype=np.int64)
+    unique_rows = np.unique(np.concatenate(rows), axis=0)
+    points, counts = np.unique(unique_rows[:, 0], return_counts=True)
+    return points[counts > 1]
+
+
+def _cut(ring: np.ndarray, junctions: np.ndarray, width: int) -> list:
+    open_ring = ring[:-1]
+    keys = open_ring[:, 0] * width + open_ring[:, 1]
+    cuts = np.flatnonzero(np.isin(keys, junctions))
+    start = int(cuts[0]) if len(cuts) else int(np.argmin(keys))
+    rotated = np.roll(open_ring, -start, axis=0)
+    closed = np.vstack([rotated, rotated[:1]])
+    if len(cuts) == 0:
+        return [closed]
+    bounds = np.append((cuts - start) % len(open_ring), len(open_ring))
+    bounds.sort()
+    return [closed[a:b + 1] for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+def to_topojson(geo_df: 'gpd.GeoDataFrame',
+                quantization: int,
+                object_name: str = 'regions',
+                properties: tuple[str, ...] = ('shapeName',)) -> dict[str, Any]:
+    """Encode polygons as quantized TopoJSON with shared, delta-coded arcs."""
+    minx, miny, maxx, maxy = geo_df.total_bounds
+    scale = np.array([(maxx - minx) / (quantization - 1) or 1.0,
+                      (maxy - miny) / (quantization - 1) or 1.0])
+    origin = np.array([minx, miny])
+    width = quantization + 1
+
+    features = [_polygon_rings(geom, origin, scale)
+                for geom in geo_df.geometry.values]
+    junctions = _junctions(
+        [ring for polygons in features for rings in polygons for ring in rings],
+        width,
+    )
+
+    arcs: list[np.ndarray] = []
+    arc_ids: dict[bytes, int] = {}
+
+    def arc_index(arc: np.ndarray) -> int:
+        key = np.ascontiguousarray(arc).tobytes()
+        if key in arc_ids:
+            return arc_ids[key]
+        reverse_key = np.ascontiguousarray(arc[::-1]).tobytes()
+        if reverse_key in arc_ids:
+            return ~arc_ids[reverse_key]
+        arc_ids[key] = len(arcs)
+        arcs.append(arc)
+        return arc_ids[key]
+
+    geometries = []
+    records = geo_df[list(properties)].to_dict('records')
+    for polygons, record in zip(features, records):
+        encoded = [[[arc_index(arc) for arc in _cut(ring, junctions, width)]
+                    for ring in rings]
+                   for rings in polygons]
+        geometry: dict[str, Any] = {'properties': record}
+        if not encoded:
+            geometry['type'] = None
+        elif len(encoded) == 1:
+            geometry.update(type='Polygon', arcs=encoded[0])
+        else:
+            geometry.update(type='MultiPolygon', arcs=encoded)
+        geometries.append(geometry)
+
+    return {
+        'type': 'Topology',
+        'transform': {'scale': scale.tolist(), 'translate': origin.tolist()},
+        'objects': {object_name: {'type': 'GeometryCollection',
+                                  'geometries': geometries}},
+        'arcs': [np.vstack([arc[:1], np.diff(arc, axis=0)]).tolist()
+                 for arc in arcs],
+    }
+
+
+def regions_payload(geo_df: 'gpd.GeoDataFrame',
+                    lod: Lod,
+                    geo_format: str) -> dict[str, Any]:
+    if geo_format == 'topojson':
+        return to_topojson(geo_df, lod.quantization)
+    return json.loads(geo_df[['shapeName', 'geometry']].to_json(drop_id=True))
+
+
+def build_regions_payload(boundary_dir: str,
+                          iso: str,
+                          lod: int,
+                          geo_format: str) -> dict[str, Any] | None:
+    """Process-pool entry point; reads boundaries from the on-disk store."""
+    geojson = BoundaryStore(boundary_dir).load(iso, 'ADM1')
+    if geojson is None:
+        return None
+    geo_df = simplify_geo_df(build_country_geometry(geojson).geo_df, LODS[lod])
+    return regions_payload(geo_df, LODS[lod], geo_format)
+
+
+class LodCache:
+    """Simplified geometry and map payloads per (iso, lod), built once.
+
+    ``offload`` lets payload construction run elsewhere, e.g. in a process
+    pool, instead of from the in-process GeometryCache.
+    """
+
+    def __init__(self, geometries: GeometryCache,
+                 lods: dict[int, Lod] = LODS,
+                 offload: Callable[[str, int, str], dict | None] | None = None):
+        self._geometries = geometries
+        self.lods = lods
+        self._offload = offload
+        self._geo_dfs: dict[tuple[str, int], 'gpd.GeoDataFrame'] = {}
+        self._payloads: dict[tuple[str, int, str], dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def geo_df(self, iso: str, lod: int) -> 'gpd.GeoDataFrame | None':
+        key = (iso, lod)
+        entry = self._geo_dfs.get(key)
+        if entry is not None:
+            return entry
+        geometry = self._geometries.get(iso)
+        if geometry is None:
+            return None
+        with self._lock:
+            entry = self._geo_dfs.get(key)
+            if entry is None:
+                entry = simplify_geo_df(geometry.geo_df, self.lods[lod])
+                self._geo_dfs[key] = entry
+        return entry
+
+    def regions(self, iso: str, lod: int, geo_format: str) -> dict | None:
+        key = (iso, lod, geo_format)
+        entry = self._payloads.get(key)
+        if entry is not None:
+            return entry
+        if self._offload is not None:
+            entry = self._offload(iso, lod, geo_format)
+        else:
+            geo_df = self.geo_df(iso, lod)
+            if geo_df is not None:
+                entry = regions_payload(geo_df, self.lods[lod], geo_format)
+        if entry is None:
+            return None
+        with self._lock:
+            return self._payloads.setdefault(key, entry)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._geo_dfs.clear()
+            self._payloads.clear()
@@ -0,0 +1,177 @@
+import argparse
+import json
+import time
+from datetime import datetime, timezone
+from typing import Any
+
+import numpy as np
+import polars as pl
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import RandomizedSearchCV, TimeSeriesSplit
+from sklearn.pipeline import Pipeline
+
+from civil_unrest_correlation_analysis.utils.model import (
+    MODEL_DIR,
+    ModelRegistry,
+    build_pipeline,
+    data_hash,
+    split_features,
+)
+from civil_unrest_correlation_analysis.utils.store import scan_store
+
+PARAM_DISTRIBUTIONS: dict[str, list[Any]] = {
+    'model__n_estimators': [100, 200, 400],
+    'model__max_depth': [None, 8, 16, 32],
+    'model__min_samples_leaf': [1, 2, 4],
+    'model__max_features': [1.0, 0.5, 'sqrt'],
+}
+
+
+def month_folds(year_months: np.ndarray,
+                n_splits: int) -> list[tuple[np.ndarray, np.ndarray]]:
+    """TimeSeriesSplit over whole months, so no month straddles a fold."""
+    months = np.unique(year_months)
+    folds = []
+    for train_months, test_months in TimeSeriesSplit(n_splits).split(months):
+        folds.append((
+            np.flatnonzero(np.isin(year_months, months[train_months])),
+            np.flatnonzero(np.isin(year_months, months[test_months])),
+        ))
+    return folds
+
+
+def holdout_split(data: pl.DataFrame,
+                  holdout: float) -> tuple[pl.DataFrame, pl.DataFrame]:
+    """Hold out the latest ``holdout`` share of months for evaluation.
+
+    Raises ValueError unless 0 < holdout < 1 and there are at least two
+    months; each side always gets at least one month.
+    """
+    if not 0 < holdout < 1:
+        raise ValueError(f'holdout must be between 0 and 1, got {holdout}')
+    months = data['year_month'].unique().sort()
+    if len(months) < 2:
+        raise ValueError('Need at least two months to hold any out')
+    split = min(max(int(len(months) * (1 - holdout)), 1), len(months) - 1)
+    cutoff = months[split]
+    return (data.filter(pl.col('year_month') < cutoff),
+            data.filter(pl.col('year_month') >= cutoff))
+
+
+def train(data: pl.DataFrame,
+          n_iter: int = 20,
+          n_splits: int = 5,
+          holdout: float = 0.2,
+          n_jobs: int = -1,
+          seed: int = 42) -> tuple[Pipeline, dict[str, Any]]:
+    started = time.perf_counter()
+    data = data.sort(['year_month', 'iso'], maintain_order=True)
+    train_df, test_df = holdout_split(data, holdout)
+    X_train, y_train = split_features(train_df)  # noqa: N806
+    X_test, y_test = split_features(test_df)  # noqa: N806
+    X_train, X_test = X_train.to_pandas(), X_test.to_pandas()  # noqa: N806
+
+    # Trees stay single-threaded while the search parallelises over
+    # candidates and folds, so the two levels don't oversubscribe cores.
+    search = RandomizedSearchCV(
+        build_pipeline(n_jobs=1),
+        PARAM_DISTRIBUTIONS,
+        n_iter=n_iter,
+        cv=month_folds(train_df['year_month'].to_numpy(), n_splits),
+        scoring='r2',
+        n_jobs=n_jobs,
+        refit=False,
+        random_state=seed,
+    )
+    search.fit(X_train, y_train.to_numpy())
+    search_seconds = time.perf_counter() - started
+
+    fit_started = time.perf_counter()
+    pipe = build_pipeline(search.best_params_, n_jobs=n_jobs)
+    pipe.fit(X_train, y_train.to_numpy())
+    fit_seconds = time.perf_counter() - fit_started
+
+    predict_started = time.perf_counter()
+    y_pred = pipe.predict(X_test)
+    predict_seconds = time.perf_counter() - predict_started
+
+    best = search.best_index_
+    metadata = {
+        'model_name': 'OECD/ACLED Random Forest Regression',
+        'version': '2.0',
+        'trained_date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'algorithm': 'Random Forest Regressor',
+        'params': search.best_params_,
+        'performance_metrics': {
+            'r2_score': float(r2_score(y_test, y_pred)),
+            'mae': float(mean_absolute_error(y_test, y_pred)),
+            'rmse': float(np.sqrt(mean_squared_error(y_test, y_pred))),
+            'cv_r2_mean': float(search.cv_results_['mean_test_score'][best]),
+            'cv_r2_std': float(search.cv_results_['std_test_score'][best]),
+        },
+        'timings': {
+            'search_seconds': search_seconds,
+            'fit_seconds': fit_seconds,
+            'predict_seconds': predict_seconds,
+            'total_seconds': time.perf_counter() - started,
+        },
+        'training_data': {
+            'data_hash': data_hash(data),
+            'size': len(data),
+            'train_rows': len(train_df),
+            'test_rows': len(test_df),
+            'train_months': [train_df['year_month'].min(),
+                             train_df['year_month'].max()],
+            'test_months': [test_df['year_month'].min(),
+                            test_df['year_month'].max()],
+            'cv_splits': n_splits,
+            'description': 'Random Forest Regression on OECD/ACLED data',
+        },
+        'authors': 'Jacque Sheehan, Sean McLeaish',
+    }
+    return pipe, metadata
+
+
+def _share(value: str) -> float:
+    share = float(value)
+    if not 0 < share < 1:
+        raise argparse.ArgumentTypeError(f'{value} is not between 0 and 1')
+    return share
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description='Train and register the incident model offline.'
+    )
+    parser.add_argument('--data-csv', default='data/final/data.csv')
+    parser.add_argument('--registry', default=MODEL_DIR)
+    parser.add_argument('--n-iter', type=int, default=20,
+                        help='Hyperparameter candidates to try')
+    parser.add_argument('--cv-splits', type=int, default=5)
+    parser.add_argument('--holdout', type=_share, default=0.2,
+                        help='Share of the latest months held out for metrics')
+    parser.add_argument('--n-jobs', type=int, default=-1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--force', action='store_true',
+                        help='Retrain even when a model is registered')
+    args = parser.parse_args(argv)
+
+    data = scan_store(args.data_csv).collect()
+    registry = ModelRegistry(args.registry)
+    key = data_hash(data)
+    if registry.has(key) and not args.force:
+        print(f'{key} is already registered')
+        return
+    pipe, metadata = train(data,
+                           n_iter=args.n_iter,
+                           n_splits=args.cv_splits,
+                           holdout=args.holdout,
+                           n_jobs=args.n_jobs,
+                           seed=args.seed)
+    path = registry.put(key, pipe, metadata)
+    print(f'{key} -> {path}')
+    print(json.dumps(metadata['performance_metrics'], indent=1))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import threading
+from collections.abc import Callable
+
+PENDING = 'pending'
+LOADING = 'loading'
+READY = 'ready'
+FAILED = 'failed'
+
+
+class Readiness:
+    """Per-component warm-up state shared by the loader and the routes."""
+
+    def __init__(self, components: list[str]):
+        self.components = list(components)
+        self._states: dict[str, str] = {}
+        self._errors: dict[str, str] = {}
+        self._changed = threading.Condition()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._changed:
+            self._states = dict.fromkeys(self.components, PENDING)
+            self._errors = {}
+            self._changed.notify_all()
+
+    def _set(self, component: str, state: str, error: str | None = None):
+        with self._changed:
+            self._states[component] = state
+            if error is not None:
+                self._errors[component] = error
+            elif state == READY:
+                self._errors.pop(component, None)
+            self._changed.notify_all()
+
+    def run(self,
+            component: str,
+            load: Callable[[], None],
+            attempts: int = 1,
+            backoff: float = 0.0,
+            stop: threading.Event | None = None) -> None:
+        """Run one stage, retrying with exponential backoff.
+
+        Between attempts the component stays loading and shows its last
+        error; it is marked failed only once the attempts run out or
+        ``stop`` is set.
+        """
+        stop = stop or threading.Event()
+        self._set(component, LOADING)
+        for attempt in range(attempts):
+            try:
+                load()
+            except Exception as e:
+                error = f'{type(e).__name__}: {e}'
+                if attempt + 1 >= attempts or stop.is_set():
+                    self._set(component, FAILED, error)
+                    raise
+                self._set(component, LOADING, error)
+                stop.wait(backoff * 2 ** attempt)
+                continue
+            self._set(component, READY)
+            return
+
+    def is_ready(self, component: str | None = None) -> bool:
+        with self._changed:
+            if component is not None:
+                return self._states[component] == READY
+            return all(s == READY for s in self._states.values())
+
+    def states(self) -> tuple[dict[str, str], dict[str, str]]:
+        with self._changed:
+            return dict(self._states), dict(self._errors)
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Block until every component is ready or any has failed."""
+        with self._changed:
+            self._changed.wait_for(
+                lambda: FAILED in self._states.values()
+                or all(s == READY for s in self._states.values()),
+                timeout,
+            )
+            return all(s == READY for s in self._states.values())
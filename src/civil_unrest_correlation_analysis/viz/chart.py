@@ -1,73 +1,91 @@
-import copy
+import os
+from functools import cache
 from typing import Any
 import altair as alt
-import geopandas as gpd
 import polars as pl
-from geoacled.chart import Choropleth
-from geoacled.geojson import build_geo_df
-from shapely import Point
-from sklearn.pipeline import Pipeline
 
+VALIDATE_SPECS = os.environ.get("VALIDATE_SPECS", "") == "1"
+FONT_STACK = 'Inter, system-ui, -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, Helvetica, Arial, sans-serif'
+COMPARE_COLUMNS = 4
+COMPARE_MAP_WIDTH = 300
+COMPARE_MAP_HEIGHT = 220
+GEO_FORMATS = {
+    "geojson": alt.DataFormat(type="json", property="features"),
+    "topojson": alt.DataFormat(type="topojson", feature="regions"),
+}
 
-def pop_toplevel_blocks(spec: dict) -> tuple[dict, dict, dict]:
-    """Return (clean_spec, datasets, config)."""
-    s = copy.deepcopy(spec)
-    datasets = s.pop("datasets", {}) or {}
-    config = s.pop("config", {}) or {}
-    s.pop("$schema", None)
-    return s, datasets, config
 
-
-def prediction_line_chart(df: pl.DataFrame, pipe: Pipeline) -> alt.Chart:
-    feature_cols = list(pipe.feature_names_in_)
-
-    X = df.select(feature_cols).to_pandas()
-
-    y_pred = pipe.predict(X)
-
-    results = (
-        df.with_columns(
-            pl.Series("predicted", y_pred)
+def prediction_line_chart() -> alt.Chart:
+    return (
+        alt.Chart(alt.Data(name="line"))
+        .mark_line(strokeWidth=2)
+        .encode(
+            x=alt.X("year_month:T", title="Month"),
+            y=alt.Y("Incidents:Q", title="Incidents", scale=alt.Scale(zero=True)),
+            color=alt.Color(
+                "Series:N",
+                scale=alt.Scale(
+                    domain=["Actual", "Predicted"],
+                    range=["#1f77b4", "#ff7f0e"],
+                ),
+                legend=alt.Legend(title=""),
+            ),
+            tooltip=[
+                alt.Tooltip("year_month:T", title="Month"),
+                alt.Tooltip("Series:N"),
+                alt.Tooltip("Incidents:Q"),
+            ],
         )
-        .with_columns(
-            pl.col("year_month")
-            .str.strptime(pl.Date, format="%Y-%m")
-            .cast(pl.Datetime)
-            .alias("year_month")
+        .properties(
+            title="Actual vs Predicted Incidents",
+            width=700,
+            height=300,
         )
-        .sort("year_month")
     )
 
-    plot_df = (
-        results.select(
-            "year_month",
-            pl.col("incidents").alias("Actual"),
-            pl.col("predicted").alias("Predicted"),
+
+def choropleth(geo_format: str) -> alt.Chart:
+    return (
+        alt.Chart(alt.Data(name="regions", format=GEO_FORMATS[geo_format]))
+        .mark_geoshape(stroke="white", strokeWidth=0.5)
+        .transform_lookup(
+            lookup="properties.shapeName",
+            from_=alt.LookupData(
+                data=alt.Data(name="counts"),
+                key="shapeName",
+                fields=["Number of incidents"],
+            ),
+            default=0,
         )
-        .to_pandas()
-        .melt(
-            id_vars="year_month",
-            var_name="Series",
-            value_name="Incidents",
+        .encode(
+            color=alt.Color("Number of incidents:Q",
+                            scale=alt.Scale(scheme="reds")),
+            tooltip=[
+                alt.Tooltip("properties.shapeName:N", title="Region"),
+                alt.Tooltip("Number of incidents:Q",
+                            title="Number of incidents"),
+            ],
         )
+        .properties(title="", width=700, height=500)
     )
 
-    line_chart = (
-        alt.Chart(plot_df)
+
+def comparison_line_chart() -> alt.Chart:
+    return (
+        alt.Chart(alt.Data(name="line"))
         .mark_line(strokeWidth=2)
         .encode(
             x=alt.X("year_month:T", title="Month"),
             y=alt.Y("Incidents:Q", title="Incidents", scale=alt.Scale(zero=True)),
-            color=alt.Color(
+            color=alt.Color("Country:N", legend=alt.Legend(title="")),
+            strokeDash=alt.StrokeDash(
                 "Series:N",
-                scale=alt.Scale(
-                    domain=["Actual", "Predicted"],
-                    range=["#1f77b4", "#ff7f0e"],
-                ),
+                scale=alt.Scale(domain=["Actual", "Predicted"]),
                 legend=alt.Legend(title=""),
             ),
             tooltip=[
                 alt.Tooltip("year_month:T", title="Month"),
+                alt.Tooltip("Country:N"),
                 alt.Tooltip("Series:N"),
                 alt.Tooltip("Incidents:Q"),
             ],
@@ -79,90 +97,125 @@ def prediction_line_chart(df: pl.DataFrame, pipe: Pipeline) -> alt.Chart:
         )
     )
 
-    return line_chart
-
-def choropleth(geojson: dict[str, Any],
-                     acled_df: pl.DataFrame,
-                     country: str,
-                     start: str,
-                     end: str) -> Choropleth:
-    geo_df = build_geo_df(geojson)
-    pdf = acled_df.to_pandas()
-
-    geometry = [
-        Point(lon, lat)
-        for lon, lat in zip(pdf["longitude"], pdf["latitude"])
-    ]
-
-    points_gdf = gpd.GeoDataFrame(
-        pdf,
-        geometry=geometry,
-        crs="EPSG:4326",
+
+def _finish_spec(spec: dict[str, Any]) -> dict[str, Any]:
+    cfg = spec.setdefault("config", {})
+    cfg["font"] = FONT_STACK
+    for block, keys in [("title", ["font"]),
+                        ("axis", ["labelFont", "titleFont"]),
+                        ("legend", ["labelFont", "titleFont"])]:
+        cfg.setdefault(block, {}).update({key: FONT_STACK for key in keys})
+    spec["$schema"] = "https://vega.github.io/schema/vega-lite/v6.json"
+    return spec
+
+
+@cache
+def spec_template(geo_format: str) -> dict[str, Any]:
+    """Static vconcat spec; requests only fill in the named datasets."""
+    return _finish_spec(
+        alt.vconcat(choropleth(geo_format), prediction_line_chart()).to_dict()
+    )
+
+
+@cache
+def comparison_template(geo_format: str) -> dict[str, Any]:
+    """Map grid over one shared line chart; the grid holds one map.
+
+    Altair takes tens of milliseconds per chart, so the map is copied
+    per country with renamed datasets instead of rebuilt.
+    """
+    grid = alt.concat(
+        choropleth(geo_format).properties(width=COMPARE_MAP_WIDTH,
+                                          height=COMPARE_MAP_HEIGHT),
+        columns=COMPARE_COLUMNS,
     )
-    geo_df = geo_df.to_crs(points_gdf.crs)
+    spec = alt.vconcat(grid, comparison_line_chart()).to_dict()
+    # Altair hoists the map's data onto the grid; each map needs its own.
+    grid_spec = spec["vconcat"][0]
+    grid_spec["concat"][0]["data"] = grid_spec.pop("data")
+    return _finish_spec(spec)
+
+
+def line_dataset(df: pl.DataFrame) -> list[dict[str, Any]]:
+    return (
+        df.sort("year_month")
+        .select(
+            (pl.col("year_month") + "-01T00:00:00").alias("year_month"),
+            pl.col("incidents").cast(pl.Float64).alias("Actual"),
+            pl.col("predicted").cast(pl.Float64).alias("Predicted"),
+        )
+        .unpivot(index="year_month", variable_name="Series", value_name="Incidents")
+        .to_dicts()
+    )
+
 
-    joined = gpd.sjoin(
-        points_gdf,
-        geo_df,
-        how="left",
-        predicate="within",
+def counts_dataset(region_counts: pl.DataFrame) -> list[dict[str, Any]]:
+    return region_counts.select(
+        "shapeName",
+        pl.col("incident_count").alias("Number of incidents"),
+    ).to_dicts()
+
+
+def render_spec(geo_format: str,
+                line: list[dict[str, Any]],
+                regions: dict[str, Any],
+                counts: list[dict[str, Any]]) -> dict[str, Any]:
+    spec = dict(spec_template(geo_format))
+    spec["datasets"] = {"line": line, "regions": regions, "counts": counts}
+    if VALIDATE_SPECS:
+        alt.VConcatChart.from_dict(spec)
+    return spec
+
+
+def comparison_line_dataset(df: pl.DataFrame,
+                            names: dict[str, str]) -> list[dict[str, Any]]:
+    return (
+        df.sort("iso", "year_month", maintain_order=True)
+        .select(
+            (pl.col("year_month") + "-01T00:00:00").alias("year_month"),
+            pl.col("iso").replace_strict(names).alias("Country"),
+            pl.col("incidents").cast(pl.Float64).alias("Actual"),
+            pl.col("predicted").cast(pl.Float64).alias("Predicted"),
+        )
+        .unpivot(index=["year_month", "Country"],
+                 variable_name="Series",
+                 value_name="Incidents")
+        .to_dicts()
     )
-    counts = (
-        joined
-        .groupby("shapeName")
-        .size()
-        .reset_index(name="incident_count")
-    )        
-    incident_count_df = pl.from_pandas(counts)
-    incident_count_df = incident_count_df.rename({'incident_count': 'Number of incidents'})
-    return Choropleth(
-    title='',
-    lookup_df=incident_count_df,
-    lookup_column="shapeName",
-    geo_df=geo_df,
-    geojson_id="shapeName",
-    basemap_color_column='Number of incidents',
-    basemap_color_scheme='reds',
-    basemap_tooltips={'shapeName': 'Region',
-                      'Number of incidents': 'Number of incidents'}
-)
-def concat_chart(line: alt.Chart,
-                 choropleth: alt.LayerChart) -> alt.VConcatChart:
-
-    map_spec, map_datasets, map_config = pop_toplevel_blocks(choropleth.chart.to_dict())
-    line_spec, line_datasets, line_config = pop_toplevel_blocks(line.to_dict())
-
-    datasets = {}
-    datasets.update(map_datasets)
-    datasets.update(line_datasets)
-
-    config = {}
-    config.update(map_config)
-    config.update(line_config)
-
-    font_stack = 'Inter, system-ui, -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, Helvetica, Arial, sans-serif'
-    cfg = dict(config) 
-    cfg["font"] = font_stack
-
-    cfg.setdefault("title", {})
-    cfg["title"]["font"] = font_stack
-
-    cfg.setdefault("axis", {})
-    cfg["axis"]["labelFont"] = font_stack
-    cfg["axis"]["titleFont"] = font_stack
-
-    cfg.setdefault("legend", {})
-    cfg["legend"]["labelFont"] = font_stack
-    cfg["legend"]["titleFont"] = font_stack
-    
-    combined_spec = {
-        "$schema": "https://vega.github.io/schema/vega-lite/v6.json",
-        "datasets": datasets if datasets else None,
-        "config": cfg if cfg else None,
-        "vconcat": [map_spec, line_spec],
+
+
+def _country_map(template: dict[str, Any],
+                 iso: str,
+                 name: str) -> dict[str, Any]:
+    lookup = template["transform"][0]
+    return {
+        **template,
+        "data": {**template["data"], "name": f"regions-{iso}"},
+        "transform": [{
+            **lookup,
+            "from": {**lookup["from"], "data": {"name": f"counts-{iso}"}},
+        }],
+        "title": name,
     }
 
-    combined_spec = {k: v for k, v in combined_spec.items() if v is not None}
 
-    combined_chart = alt.VConcatChart.from_dict(combined_spec)
-    return(combined_chart)
\ No newline at end of file
+def render_comparison_spec(
+    geo_format: str,
+    line: list[dict[str, Any]],
+    maps: list[tuple[str, str, dict[str, Any], list[dict[str, Any]]]],
+) -> dict[str, Any]:
+    """One spec for many countries; ``maps`` holds (iso, name, regions, counts)."""
+    spec = dict(comparison_template(geo_format))
+    grid, line_chart = spec["vconcat"]
+    template = grid["concat"][0]
+    datasets: dict[str, Any] = {"line": line}
+    charts = []
+    for iso, name, regions, counts in maps:
+        datasets[f"regions-{iso}"] = regions
+        datasets[f"counts-{iso}"] = counts
+        charts.append(_country_map(template, iso, name))
+    spec["vconcat"] = [{**grid, "concat": charts}, line_chart]
+    spec["datasets"] = datasets
+    if VALIDATE_SPECS:
+        alt.VConcatChart.from_dict(spec)
+    return spec